@@ -1,6 +1,22 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from django.core import checks
+
+        from api import signals  # noqa: F401
+        from api.utils.db import check_replica_cache
+        checks.register(check_replica_cache, checks.Tags.caches)
+        if settings.DB_CONN_HEALTH_CHECKS:
+            from django.core.signals import request_started
+
+            from api.utils.db import check_connections
+            request_started.connect(check_connections)
+        if settings.REQUEST_METRICS:
+            from api.utils.instrumentation import install
+            install()
@@ -0,0 +1,72 @@
+from bisect import bisect_left
+from threading import Lock
+
+from api.utils.versions import get_model_version
+from recipes.models import Ingredient
+
+PREFIX_END = chr(0x10FFFF)
+
+_lock = Lock()
+_catalog = None
+
+
+class IngredientCatalog:
+    """Каталог ингредиентов в памяти процесса.
+
+    Названия хранятся отсортированными в casefold, поиск по началу
+    названия выполняется бинарным поиском за O(log n).
+    """
+    def __init__(self, version, ingredients):
+        self.version = version
+        items = sorted(
+            ({'id': pk, 'name': name, 'measurement_unit': unit}
+             for pk, name, unit in ingredients),
+            key=lambda item: (item['name'].casefold(), item['id'])
+        )
+        self.keys = [item['name'].casefold() for item in items]
+        self.items = items
+
+    def all(self):
+        return self.items
+
+    def startswith(self, name):
+        """Ингредиенты, название которых начинается с name."""
+        name = name.casefold()
+        start = bisect_left(self.keys, name)
+        end = bisect_left(self.keys, name + PREFIX_END, start)
+        return self.items[start:end]
+
+    def search(self, name):
+        """Сначала совпадения по началу названия, затем по вхождению.
+
+        Вхождение ищется перебором всех названий за O(n).
+        """
+        name = name.casefold()
+        prefix = self.startswith(name)
+        substring = [
+            item for key, item in zip(self.keys, self.items)
+            if name in key and not key.startswith(name)
+        ]
+        return prefix + substring
+
+
+def get_catalog():
+    """Актуальный каталог ингредиентов текущего процесса.
+
+    Каталог перечитывается из базы, когда версия модели в кэше
+    изменилась (см. сигналы в api.signals).
+    """
+    global _catalog
+    version = get_model_version(Ingredient)
+    catalog = _catalog
+    if catalog is not None and catalog.version == version:
+        return catalog
+    with _lock:
+        if _catalog is None or _catalog.version != version:
+            _catalog = IngredientCatalog(
+                version,
+                Ingredient.objects.values_list(
+                    'id', 'name', 'measurement_unit'
+                ).iterator()
+            )
+        return _catalog
@@ -1,6 +1,44 @@
+from django.db.models import Case, IntegerField, Value, When
 from rest_framework.filters import SearchFilter
 
+PREFIX_MATCH = 0
+SUBSTRING_MATCH = 1
+# Короче трёх символов в запросе нет триграмм, и индекс GIN не помогает.
+SUBSTRING_MIN_LENGTH = 3
+
 
 class IngredientSearchFilter(SearchFilter):
-    """Фильтр по Ингридиентам."""
+    """Фильтр по Ингридиентам.
+
+    По умолчанию ищет по началу названия (индекс по UPPER(name)
+    text_pattern_ops, см. миграцию 0005). С параметром substring=true
+    и запросом от SUBSTRING_MIN_LENGTH символов ищет и по вхождению
+    (индекс GIN с триграммами): сначала идут совпадения по началу.
+    """
     search_param = 'name'
+    substring_param = 'substring'
+
+    @classmethod
+    def is_substring_search(cls, request, view, name):
+        """Запрошен ли поиск по вхождению и доступен ли он вьюсету."""
+        return (
+            getattr(view, 'search_substring', True)
+            and len(name) >= SUBSTRING_MIN_LENGTH
+            and request.query_params.get(
+                cls.substring_param, ''
+            ).lower() in ('1', 'true')
+        )
+
+    def filter_queryset(self, request, queryset, view):
+        name = request.query_params.get(self.search_param, '').strip()
+        if not name:
+            return queryset
+        if not self.is_substring_search(request, view, name):
+            return queryset.filter(name__istartswith=name)
+        return queryset.filter(name__icontains=name).annotate(
+            match_rank=Case(
+                When(name__istartswith=name, then=Value(PREFIX_MATCH)),
+                default=Value(SUBSTRING_MATCH),
+                output_field=IntegerField()
+            )
+        ).order_by('match_rank', 'name')
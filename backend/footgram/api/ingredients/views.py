@@ -1,14 +1,43 @@
+from django.conf import settings
 from rest_framework import viewsets
+from rest_framework.response import Response
 
+from api.ingredients.catalog import get_catalog
 from api.ingredients.filters import IngredientSearchFilter
 from api.ingredients.serializers import IngredientSerializer
+from api.utils.mixins import CachedResponseMixin
 from recipes.models import Ingredient
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(CachedResponseMixin, viewsets.ReadOnlyModelViewSet):
     """Вьюсет Ингридиентов."""
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
 
     filter_backends = (IngredientSearchFilter,)
     search_fields = ('^name',)
+    search_substring = True
+
+    def list(self, request, *args, **kwargs):
+        """Список ингредиентов, из памяти процесса, если это включено."""
+        if not settings.INGREDIENT_CATALOG_IN_MEMORY:
+            return super().list(request, *args, **kwargs)
+        return self.cached_response(
+            self.catalog_list, request, *args, **kwargs
+        )
+
+    def catalog_list(self, request, *args, **kwargs):
+        """Поиск по каталогу ингредиентов в памяти процесса.
+
+        По умолчанию - бинарный поиск по началу названия, перебор всех
+        названий только для поиска по вхождению (substring=true).
+        """
+        catalog = get_catalog()
+        name = request.query_params.get(
+            IngredientSearchFilter.search_param, ''
+        ).strip()
+        if not name:
+            return Response(catalog.all())
+        if IngredientSearchFilter.is_substring_search(request, self, name):
+            return Response(catalog.search(name))
+        return Response(catalog.startswith(name))
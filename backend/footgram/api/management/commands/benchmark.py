@@ -0,0 +1,556 @@
+import base64
+import json
+import random
+import tempfile
+import time
+import tracemalloc
+from contextlib import ExitStack
+from io import StringIO
+from itertools import islice
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from django.test.utils import (
+    CaptureQueriesContext,
+    override_settings,
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+    teardown_test_environment
+)
+from rest_framework.authtoken.models import Token
+
+from recipes.counters import recount
+from recipes.images import get_executor
+from recipes.models import (
+    AmountIngredient,
+    FavoriteRecipe,
+    Ingredient,
+    Recipe,
+    ShoppingList,
+    Tag,
+    User
+)
+from users.models import Follow
+
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / 'benchmark_baseline.json'
+BATCH_SIZE = 5000
+BENCHMARK_PASSWORD = 'benchmark-password'
+PNG = (
+    'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwAD'
+    'hgGAWjR9awAAAABJRU5ErkJggg=='
+)
+IMAGE_NAME = 'recipes/benchmark.png'
+TAGS = (
+    ('Завтрак', '#E26C2D', 'breakfast'),
+    ('Обед', '#49B64E', 'lunch'),
+    ('Ужин', '#8775D2', 'dinner'),
+    ('Десерт', '#F2B705', 'dessert'),
+    ('Суп', '#D92B2B', 'soup'),
+    ('Салат', '#2BB1D9', 'salad'),
+)
+
+# Маршруты выполняются по кругу в указанном порядке, поэтому
+# POST и следующий за ним DELETE возвращают базу в исходное состояние.
+ROUTES = (
+    ('users-list', 'get', '/api/users/', None),
+    ('users-detail', 'get', '/api/users/{author}/', None),
+    ('users-me', 'get', '/api/users/me/', None),
+    ('users-subscriptions', 'get',
+     '/api/users/subscriptions/?recipes_limit=3', None),
+    ('users-subscribe', 'post', '/api/users/{author}/subscribe/', None),
+    ('users-unsubscribe', 'delete', '/api/users/{author}/subscribe/', None),
+    ('token-login', 'post', '/api/auth/token/login/', {
+        'email': '{email}', 'password': BENCHMARK_PASSWORD
+    }),
+    ('tags-list', 'get', '/api/tags/', None),
+    ('tags-detail', 'get', '/api/tags/{tag}/', None),
+    ('ingredients-list', 'get', '/api/ingredients/', None),
+    ('ingredients-search', 'get', '/api/ingredients/?name={prefix}', None),
+    ('ingredients-detail', 'get', '/api/ingredients/{ingredient}/', None),
+    ('recipes-list', 'get', '/api/recipes/?limit=6', None),
+    ('recipes-list-filtered', 'get',
+     '/api/recipes/?tags={tag_slug}&is_favorited=1', None),
+    ('recipes-list-cursor', 'get', '/api/recipes/?cursor=&limit=6', None),
+    ('recipes-list-popular', 'get',
+     '/api/recipes/?ordering=-favorites_count', None),
+    ('recipes-search', 'get', '/api/recipes/?search={word}', None),
+    ('recipes-match', 'get', '/api/recipes/match/?{match}', None),
+    ('recipes-detail', 'get', '/api/recipes/{recipe}/', None),
+    ('recipes-create', 'post', '/api/recipes/', {
+        'name': 'Рецепт для замера',
+        'text': 'Описание рецепта для замера.',
+        'cooking_time': 15,
+        'tags': ['{tag}'],
+        'ingredients': [{'id': '{ingredient}', 'amount': 10}],
+        'image': f'data:image/png;base64,{PNG}'
+    }),
+    ('recipes-delete', 'delete', '/api/recipes/{created}/', None),
+    ('recipes-update', 'patch', '/api/recipes/{own}/', {
+        'name': 'Рецепт для замера', 'cooking_time': 20
+    }),
+    ('recipes-favorite', 'post', '/api/recipes/{recipe}/favorite/', None),
+    ('recipes-unfavorite', 'delete',
+     '/api/recipes/{recipe}/favorite/', None),
+    ('recipes-cart-add', 'post',
+     '/api/recipes/{recipe}/shopping_cart/', None),
+    ('recipes-cart-remove', 'delete',
+     '/api/recipes/{recipe}/shopping_cart/', None),
+    ('recipes-download-cart', 'get',
+     '/api/recipes/download_shopping_cart/?format=txt', None),
+)
+
+
+def chunks(iterable, size=BATCH_SIZE):
+    """Разбиение потока объектов на списки для bulk_create."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def bulk_create(model, objects):
+    for chunk in chunks(objects):
+        model.objects.bulk_create(chunk)
+
+
+def percentile(values, percent):
+    """Значение перцентиля методом ближайшего ранга."""
+    values = sorted(values)
+    rank = max(1, round(percent / 100 * len(values)))
+    return values[rank - 1]
+
+
+def fill_template(value, ids):
+    """Подстановка id набора данных в адрес или тело запроса."""
+    if isinstance(value, str):
+        return value.format(**ids)
+    if isinstance(value, list):
+        return [fill_template(item, ids) for item in value]
+    if isinstance(value, dict):
+        return {
+            key: fill_template(item, ids) for key, item in value.items()
+        }
+    return value
+
+
+def cast_ids(value):
+    """Строки из одних цифр в телах запросов превращаются в числа."""
+    if isinstance(value, str) and value.isdigit():
+        return int(value)
+    if isinstance(value, list):
+        return [cast_ids(item) for item in value]
+    if isinstance(value, dict):
+        return {key: cast_ids(item) for key, item in value.items()}
+    return value
+
+
+class Command(BaseCommand):
+    help = (
+        'Замер числа запросов, задержки и памяти для маршрутов API '
+        'на сгенерированном наборе данных в тестовой базе.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--recipes', type=int, default=100000)
+        parser.add_argument(
+            '--favorites', type=int, default=50,
+            help='Избранных рецептов у каждого пользователя.'
+        )
+        parser.add_argument(
+            '--cart', type=int, default=10,
+            help='Рецептов в корзине у каждого пользователя.'
+        )
+        parser.add_argument(
+            '--follows', type=int, default=20,
+            help='Подписок у каждого пользователя.'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Число замеров каждого маршрута.'
+        )
+        parser.add_argument(
+            '--route', action='append', dest='routes',
+            help='Замерить только указанные маршруты.'
+        )
+        parser.add_argument(
+            '--baseline', type=Path, default=DEFAULT_BASELINE,
+            help='Файл базовых значений.'
+        )
+        parser.add_argument(
+            '--save-baseline', action='store_true',
+            help='Записать результаты как новые базовые значения.'
+        )
+        parser.add_argument(
+            '--queries-only', action='store_true',
+            help='Записать в базовые значения только число запросов: '
+                 'задержка зависит от машины.'
+        )
+        parser.add_argument(
+            '--latency-threshold', type=float, default=0.25,
+            help='Допустимый рост p95 относительно базового, доля.'
+        )
+        parser.add_argument(
+            '--query-threshold', type=int, default=0,
+            help='Допустимый рост числа запросов.'
+        )
+        parser.add_argument(
+            '--keepdb', action='store_true',
+            help='Не удалять тестовую базу и не наполнять её повторно.'
+        )
+
+    def handle(self, *args, **options):
+        self.options = options
+        dataset = {
+            key: options[key]
+            for key in ('users', 'recipes', 'favorites', 'cart', 'follows',
+                        'seed')
+        }
+        verbosity = options['verbosity']
+        with ExitStack() as stack:
+            setup_test_environment()
+            stack.callback(teardown_test_environment)
+            media_root = stack.enter_context(tempfile.TemporaryDirectory())
+            # Записи кэша не истекают, чтобы число запросов не зависело
+            # от того, попал ли замер на повторное чтение версий и токена.
+            stack.enter_context(override_settings(
+                MEDIA_ROOT=media_root,
+                CACHES={
+                    alias: {
+                        'BACKEND': 'django.core.cache.backends.locmem.'
+                                   'LocMemCache',
+                        'LOCATION': f'benchmark-{alias}',
+                        'TIMEOUT': None,
+                    }
+                    for alias in settings.CACHES
+                },
+                MODEL_VERSION_CACHE_TIMEOUT=None
+            ))
+            # Реплики с TEST['MIRROR'] переключаются на тестовую базу.
+            old_config = setup_databases(
+                verbosity=max(verbosity - 1, 0),
+                interactive=False,
+                keepdb=options['keepdb']
+            )
+            try:
+                default_storage.save(IMAGE_NAME, ContentFile(
+                    base64.b64decode(PNG)
+                ))
+                if not (options['keepdb'] and Recipe.objects.exists()):
+                    self.seed(**dataset)
+                results = self.measure(self.get_ids())
+            finally:
+                get_executor().shutdown(wait=True)
+                # Соединения реплик-зеркал тоже открыты к тестовой базе.
+                connections.close_all()
+                teardown_databases(
+                    old_config,
+                    verbosity=max(verbosity - 1, 0),
+                    keepdb=options['keepdb']
+                )
+        self.report(results)
+        self.compare(dataset, results)
+
+    def log(self, message):
+        if self.options['verbosity'] > 0:
+            self.stderr.write(message)
+
+    def seed(self, users, recipes, favorites, cart, follows, seed):
+        """Наполнение тестовой базы.
+
+        Счётчики и поисковый вектор пересчитываются после вставки,
+        так как bulk_create не вызывает сигналы.
+        """
+        rng = random.Random(seed)
+        started = time.perf_counter()
+        call_command('load_ingredients', stdout=StringIO())
+        ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+        if not ingredient_ids:
+            raise CommandError('Не удалось загрузить ингредиенты.')
+        words = [
+            name.split()[0] for name in Ingredient.objects.values_list(
+                'name', flat=True
+            )
+        ]
+        Tag.objects.bulk_create(
+            Tag(name=name, color=color, slug=slug)
+            for name, color, slug in TAGS
+        )
+        tag_ids = list(Tag.objects.values_list('id', flat=True))
+        self.log(f'Ингредиентов: {len(ingredient_ids)}, тегов: '
+                 f'{len(tag_ids)}.')
+
+        password = make_password(BENCHMARK_PASSWORD)
+        bulk_create(User, (
+            User(
+                username=f'user{number}',
+                email=f'user{number}@example.com',
+                first_name='Имя',
+                last_name='Фамилия',
+                password=password
+            )
+            for number in range(users)
+        ))
+        user_ids = list(User.objects.order_by('id').values_list(
+            'id', flat=True
+        ))
+        # Немногие авторы пишут большую часть рецептов.
+        authors = user_ids[:max(1, len(user_ids) // 5)]
+        weights = [1 / (rank + 1) for rank in range(len(authors))]
+        self.log(f'Пользователей: {len(user_ids)}.')
+
+        # У первого пользователя (от его имени идут запросы) есть свой
+        # рецепт и автор с рецептом, на которого он не подписан, а этот
+        # рецепт не в его избранном и не в корзине.
+        free_author = authors[-1]
+
+        def recipe(number):
+            title = rng.sample(words, 2)
+            if number == 0:
+                author_id = user_ids[0]
+            elif number == 1:
+                author_id = free_author
+            else:
+                author_id = rng.choices(authors, weights)[0]
+            return Recipe(
+                author_id=author_id,
+                name=f'{title[0]} и {title[1].lower()}',
+                text=' '.join(rng.sample(words, 20)),
+                image=IMAGE_NAME,
+                cooking_time=rng.randint(5, 180)
+            )
+        bulk_create(Recipe, (recipe(number) for number in range(recipes)))
+        recipe_ids = list(Recipe.objects.order_by('id').values_list(
+            'id', flat=True
+        ))
+        free_recipe = recipe_ids[1] if len(recipe_ids) > 1 else None
+        bulk_create(AmountIngredient, (
+            AmountIngredient(
+                recipe_id=recipe_id,
+                ingredient_id=ingredient_id,
+                amount=rng.randint(1, 500)
+            )
+            for recipe_id in recipe_ids
+            for ingredient_id in rng.sample(
+                ingredient_ids, rng.randint(3, 10)
+            )
+        ))
+        bulk_create(Recipe.tags.through, (
+            Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+            for recipe_id in recipe_ids
+            for tag_id in rng.sample(tag_ids, rng.randint(1, 3))
+        ))
+        self.log(f'Рецептов: {len(recipe_ids)}.')
+
+        for model, per_user in ((FavoriteRecipe, favorites),
+                                (ShoppingList, cart)):
+            bulk_create(model, (
+                model(user_id=user_id, recipe_id=recipe_id)
+                for user_id in user_ids
+                for recipe_id in rng.sample(
+                    recipe_ids, min(per_user, len(recipe_ids))
+                )
+                if (user_id, recipe_id) != (user_ids[0], free_recipe)
+            ))
+        bulk_create(Follow, (
+            Follow(user_id=user_id, author_id=author_id)
+            for user_id in user_ids
+            for author_id in rng.sample(authors, min(follows, len(authors)))
+            if author_id != user_id
+            and (user_id, author_id) != (user_ids[0], free_author)
+        ))
+        recount()
+        Recipe.objects.update_search_vector()
+        self.log(
+            f'Данные созданы за {time.perf_counter() - started:.1f} с.'
+        )
+
+    def get_ids(self):
+        """Объекты, к которым обращаются маршруты."""
+        user = User.objects.order_by('id').first()
+        own = Recipe.objects.filter(author=user).order_by('id').first()
+        if user is None or own is None:
+            raise CommandError('Тестовая база не наполнена.')
+        recipe = Recipe.objects.exclude(author=user).exclude(
+            favorite__user=user
+        ).exclude(shopping_list__user=user).order_by('id').first()
+        author = User.objects.exclude(pk=user.pk).exclude(
+            following__user=user
+        ).filter(recipes_count__gt=0).order_by('id').first()
+        tag = Tag.objects.order_by('id').first()
+        ingredients = list(AmountIngredient.objects.filter(
+            recipe=recipe
+        ).values_list('ingredient_id', flat=True))
+        if recipe is None or author is None or tag is None or not ingredients:
+            raise CommandError(
+                'В тестовой базе нет чужого рецепта вне избранного и '
+                'корзины или автора без подписки: увеличьте --users '
+                'и --recipes.'
+            )
+        ingredient = Ingredient.objects.get(pk=ingredients[0])
+        return {
+            'token': Token.objects.get_or_create(user=user)[0].key,
+            'email': user.email,
+            'own': own.pk,
+            'recipe': recipe.pk,
+            'author': author.pk,
+            'tag': tag.pk,
+            'tag_slug': tag.slug,
+            'ingredient': ingredient.pk,
+            'prefix': ingredient.name[:3],
+            'word': ingredient.name.split()[0],
+            'match': '&'.join(
+                f'ingredients={pk}' for pk in ingredients[:3]
+            ),
+            'created': None,
+        }
+
+    def request(self, client, method, path, data):
+        """Один запрос: статус, число SQL-запросов во всех базах."""
+        with ExitStack() as stack:
+            contexts = [
+                stack.enter_context(CaptureQueriesContext(connections[alias]))
+                for alias in connections
+            ]
+            started = time.perf_counter()
+            if data is None:
+                response = getattr(client, method)(path)
+            else:
+                response = getattr(client, method)(
+                    path, json.dumps(data), content_type='application/json'
+                )
+            if response.streaming:
+                b''.join(response.streaming_content)
+            elapsed = time.perf_counter() - started
+        return response, sum(len(context) for context in contexts), elapsed
+
+    def measure(self, ids):
+        """Замер маршрутов по кругу: прогрев, замеры, проход с tracemalloc."""
+        routes = [
+            route for route in ROUTES
+            if not self.options['routes'] or route[0] in self.options['routes']
+        ]
+        client = Client(HTTP_AUTHORIZATION=f'Token {ids["token"]}')
+        results = {
+            name: {'queries': 0, 'timings': [], 'peak_kib': 0}
+            for name, *_ in routes
+        }
+        repeat = self.options['repeat']
+        for round_number in range(repeat + 2):
+            warmup = round_number == 0
+            traced = round_number == repeat + 1
+            if traced:
+                tracemalloc.start()
+            for name, method, path, data in routes:
+                path = fill_template(path, ids)
+                data = cast_ids(fill_template(data, ids))
+                if traced:
+                    tracemalloc.reset_peak()
+                    current = tracemalloc.get_traced_memory()[0]
+                response, queries, elapsed = self.request(
+                    client, method, path, data
+                )
+                if response.status_code >= 400:
+                    raise CommandError(
+                        f'{name}: {method.upper()} {path} вернул '
+                        f'{response.status_code}.'
+                    )
+                if name == 'recipes-create':
+                    ids['created'] = response.json()['id']
+                result = results[name]
+                if traced:
+                    result['peak_kib'] = round(
+                        (tracemalloc.get_traced_memory()[1] - current) / 1024
+                    )
+                elif not warmup:
+                    result['queries'] = max(result['queries'], queries)
+                    result['timings'].append(elapsed * 1000)
+            if traced:
+                tracemalloc.stop()
+        return {
+            name: {
+                'queries': result['queries'],
+                'p50_ms': round(percentile(result['timings'], 50), 2),
+                'p95_ms': round(percentile(result['timings'], 95), 2),
+                'peak_kib': result['peak_kib'],
+            }
+            for name, result in results.items()
+        }
+
+    def report(self, results):
+        self.stdout.write(
+            f'{"Маршрут":<26}{"SQL":>6}{"p50, мс":>10}{"p95, мс":>10}'
+            f'{"Память, КиБ":>14}'
+        )
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:<26}{result["queries"]:>6}{result["p50_ms"]:>10}'
+                f'{result["p95_ms"]:>10}{result["peak_kib"]:>14}'
+            )
+
+    def compare(self, dataset, results):
+        """Сравнение с базовыми значениями или их сохранение."""
+        baseline_path = self.options['baseline']
+        if self.options['save_baseline']:
+            if self.options['queries_only']:
+                results = {
+                    name: {'queries': result['queries']}
+                    for name, result in results.items()
+                }
+            with open(baseline_path, 'w', encoding='utf-8') as file:
+                json.dump(
+                    {'dataset': dataset, 'routes': results},
+                    file, ensure_ascii=False, indent=2
+                )
+                file.write('\n')
+            self.stdout.write(self.style.SUCCESS(
+                f'Базовые значения сохранены в {baseline_path}.'
+            ))
+            return
+        if not baseline_path.exists():
+            self.stdout.write(
+                f'Нет файла {baseline_path}, сравнение пропущено.'
+            )
+            return
+        with open(baseline_path, encoding='utf-8') as file:
+            baseline = json.load(file)
+        if baseline['dataset'] != dataset:
+            self.stdout.write(self.style.WARNING(
+                'Базовые значения получены на другом наборе данных.'
+            ))
+        regressions = []
+        for name, result in results.items():
+            base = baseline['routes'].get(name)
+            if base is None:
+                continue
+            if result['queries'] > (
+                    base['queries'] + self.options['query_threshold']):
+                regressions.append(
+                    f'{name}: SQL-запросов {result["queries"]}, '
+                    f'было {base["queries"]}'
+                )
+            if 'p95_ms' in base and result['p95_ms'] > (
+                    base['p95_ms'] * (1 + self.options['latency_threshold'])):
+                regressions.append(
+                    f'{name}: p95 {result["p95_ms"]} мс, '
+                    f'было {base["p95_ms"]} мс'
+                )
+        if regressions:
+            raise CommandError(
+                'Ухудшение относительно базовых значений:\n'
+                + '\n'.join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS(
+            'Ухудшений относительно базовых значений нет.'
+        ))
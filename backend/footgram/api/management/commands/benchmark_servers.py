@@ -0,0 +1,212 @@
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from itertools import cycle
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.authtoken.models import Token
+
+from api.management.commands.benchmark import percentile
+from api.recipes.shopping_cart import (
+    SHOPPING_CART_FORMATS, get_shopping_cart, shopping_cart_rows
+)
+from recipes.models import Ingredient, Recipe, Tag, User
+
+# Классы воркеров из gunicorn.conf.py: sync и gthread - WSGI, uvicorn - ASGI.
+SERVERS = ('sync', 'gthread', 'uvicorn')
+READ_ROUTES = (
+    '/api/recipes/?limit=6',
+    '/api/recipes/{recipe}/',
+    '/api/tags/',
+    '/api/ingredients/?name={prefix}',
+    '/api/ingredients/{ingredient}/',
+    '/api/users/subscriptions/?recipes_limit=3',
+    *(
+        f'/api/recipes/download_shopping_cart/?format={file_format}'
+        for file_format in SHOPPING_CART_FORMATS
+    ),
+)
+START_TIMEOUT = 30
+
+
+def free_port():
+    with closing(socket.socket()) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, process):
+    deadline = time.monotonic() + START_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise CommandError('Сервер завершился при запуске.')
+        with closing(socket.socket()) as sock:
+            if sock.connect_ex(('127.0.0.1', port)) == 0:
+                return
+        time.sleep(0.2)
+    raise CommandError('Сервер не запустился.')
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнение пропускной способности маршрутов чтения '
+        'под gunicorn с воркерами WSGI и ASGI на текущей базе.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--server', action='append', choices=SERVERS, dest='servers',
+            help='Замерить только указанный режим.'
+        )
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument(
+            '--concurrency', type=int, default=32,
+            help='Число одновременных клиентов.'
+        )
+        parser.add_argument(
+            '--duration', type=float, default=10,
+            help='Длительность замера, секунд.'
+        )
+
+    def handle(self, *args, **options):
+        paths = self.get_paths()
+        results = {}
+        for name in options['servers'] or SERVERS:
+            results[name] = self.measure(name, paths, **options)
+        self.stdout.write(
+            f'{"Воркер":<8}{"Запросов/с":>12}{"p50, мс":>10}{"p95, мс":>10}'
+            f'{"Ошибок":>9}'
+        )
+        for name, (rps, p50, p95, errors) in results.items():
+            self.stdout.write(
+                f'{name:<8}{rps:>12.1f}{p50:>10.1f}{p95:>10.1f}{errors:>9}'
+            )
+
+    def get_paths(self):
+        user = (
+            User.objects.filter(shopping_list__isnull=False).first()
+            or User.objects.order_by('id').first()
+        )
+        recipe = Recipe.objects.order_by('id').first()
+        ingredient = Ingredient.objects.order_by('id').first()
+        if not (user and recipe and ingredient and Tag.objects.exists()):
+            raise CommandError(
+                'В базе нет данных: нужны пользователи, рецепты, '
+                'теги и ингредиенты.'
+            )
+        self.token = Token.objects.get_or_create(user=user)[0].key
+        rows = list(shopping_cart_rows(get_shopping_cart(user)))
+        self.expected = {
+            f'/api/recipes/download_shopping_cart/?format={file_format}':
+                ''.join(stream(rows)).encode()
+            for file_format, (stream, _) in SHOPPING_CART_FORMATS.items()
+        }
+        ids = {
+            'recipe': recipe.pk,
+            'ingredient': ingredient.pk,
+            'prefix': ingredient.name[:3],
+        }
+        return [
+            quote(path.format(**ids), safe='/?=&') for path in READ_ROUTES
+        ]
+
+    def measure(self, name, paths, workers, concurrency, duration,
+                verbosity, **options):
+        """Запуск сервера и нагрузка concurrency клиентами."""
+        port = free_port()
+        process = subprocess.Popen(
+            (
+                sys.executable, '-m', 'gunicorn.app.wsgiapp',
+                '--config', 'gunicorn.conf.py'
+            ),
+            cwd=settings.BASE_DIR,
+            env={
+                **os.environ,
+                'GUNICORN_WORKER_CLASS': name,
+                'GUNICORN_BIND': f'127.0.0.1:{port}',
+                'GUNICORN_WORKERS': str(workers),
+            },
+            stdout=subprocess.DEVNULL,
+            stderr=None if verbosity > 1 else subprocess.DEVNULL
+        )
+        try:
+            wait_for_port(port, process)
+            self.verify(name, port)
+            self.stderr.write(f'{name}: нагрузка {duration} с...')
+            self.client(port, paths, time.monotonic() + 1)
+            deadline = time.monotonic() + duration
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                runs = list(executor.map(
+                    lambda offset: self.client(
+                        port, paths[offset:] + paths[:offset], deadline
+                    ),
+                    (number % len(paths) for number in range(concurrency))
+                ))
+        finally:
+            process.terminate()
+            process.wait()
+        timings = [timing for run, _ in runs for timing in run]
+        errors = sum(errors for _, errors in runs)
+        if not timings:
+            raise CommandError(f'{name}: нет успешных ответов.')
+        return (
+            len(timings) / duration,
+            percentile(timings, 50),
+            percentile(timings, 95),
+            errors
+        )
+
+    def verify(self, name, port):
+        """Потоковые ответы совпадают с выгрузкой в этом процессе.
+
+        Оборванный поток отдаётся со статусом 200, поэтому проверяется
+        тело ответа.
+        """
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        try:
+            for path, body in self.expected.items():
+                try:
+                    connection.request(
+                        'GET', path,
+                        headers={'Authorization': f'Token {self.token}'}
+                    )
+                    response = connection.getresponse()
+                    valid = response.status == 200 and response.read() == body
+                except (OSError, http.client.HTTPException):
+                    valid = False
+                if not valid:
+                    raise CommandError(f'{name}: неверный ответ {path}.')
+        finally:
+            connection.close()
+
+    def client(self, port, paths, deadline):
+        """Клиент с keep-alive соединением: время ответов и число ошибок."""
+        headers = {'Authorization': f'Token {self.token}'}
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        timings = []
+        errors = 0
+        for path in cycle(paths):
+            if time.monotonic() >= deadline:
+                break
+            started = time.perf_counter()
+            try:
+                connection.request('GET', path, headers=headers)
+                response = connection.getresponse()
+                response.read()
+            except (OSError, http.client.HTTPException):
+                errors += 1
+                connection.close()
+                continue
+            if response.status >= 400:
+                errors += 1
+            else:
+                timings.append((time.perf_counter() - started) * 1000)
+        connection.close()
+        return timings, errors
@@ -0,0 +1,28 @@
+from rest_framework import serializers
+
+from recipes.images import variant_url
+
+
+class ImageVariantField(serializers.Field):
+    """Адрес уменьшенного варианта изображения рецепта.
+
+    Пока варианты не созданы (Recipe.image_variants_source),
+    отдаётся адрес оригинала.
+    """
+    def __init__(self, variant, **kwargs):
+        self.variant = variant
+        kwargs.setdefault('source', 'image')
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, image):
+        if not image:
+            return None
+        if image.instance.image_variants_source == image.name:
+            url = variant_url(image.name, self.variant)
+        else:
+            url = image.url
+        request = self.context.get('request')
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
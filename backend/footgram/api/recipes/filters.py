@@ -1,7 +1,10 @@
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import F, Q
 from django_filters.rest_framework import FilterSet, filters
 
-from recipes.models import Recipe, Tag
+from recipes.models import SEARCH_CONFIG, Recipe, Tag
 
 User = get_user_model()
 
@@ -17,6 +20,7 @@ class RecipeFilter(FilterSet):
     is_favorited = filters.BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart')
+    search = filters.CharFilter(method='filter_search')
 
     class Meta:
         model = Recipe
@@ -33,3 +37,25 @@ class RecipeFilter(FilterSet):
         if value and user.is_authenticated:
             return queryset.filter(shopping_list__user=user)
         return queryset
+
+    def filter_search(self, queryset, name, value):
+        """Полнотекстовый поиск по названию, тексту и ингредиентам.
+
+        На PostgreSQL используется поисковый вектор с GIN-индексом и
+        сортировка по релевантности, на остальных СУБД - icontains.
+        """
+        value = value.strip()
+        if not value:
+            return queryset
+        if connections[queryset.db].vendor != 'postgresql':
+            return queryset.filter(
+                Q(name__icontains=value)
+                | Q(text__icontains=value)
+                | Q(ingredients__name__icontains=value)
+            ).distinct()
+        query = SearchQuery(
+            value, config=SEARCH_CONFIG, search_type='websearch'
+        )
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F('search_vector'), query)
+        ).order_by('-search_rank', '-pub_date')
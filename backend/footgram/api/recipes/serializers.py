@@ -1,12 +1,14 @@
 from django.core import validators
-from django.shortcuts import get_object_or_404
+from django.db import transaction
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import exceptions, serializers
 from rest_framework.validators import UniqueTogetherValidator
 
+from api.recipes.fields import ImageVariantField
 from api.recipes.short_recipe_serializer import ShortRecipeSerializer
 from api.tags.serializers import TagSerializer
 from api.users.serializers import CustomUserSerializer
+from api.utils.relations import get_user_relations
 from recipes.models import (
     AmountIngredient,
     Ingredient,
@@ -59,6 +61,8 @@ class RecipeSerializer(serializers.ModelSerializer):
     is_in_shopping_cart = serializers.SerializerMethodField()
     ingredients = serializers.SerializerMethodField()
     image = Base64ImageField()
+    image_thumbnail = ImageVariantField('thumbnail')
+    image_webp = ImageVariantField('webp')
     author = CustomUserSerializer(read_only=True)
     tags = TagSerializer(read_only=True, many=True)
 
@@ -73,31 +77,59 @@ class RecipeSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'image_thumbnail',
+            'image_webp',
             'text',
             'cooking_time'
         )
 
     def get_ingredients(self, obj):
-        ingredients = AmountIngredient.objects.filter(recipe=obj)
+        ingredients = obj.amountingredient_set.all()
         serializer = FullAmountIngredientSerializer(ingredients, many=True)
         return serializer.data
 
     def get_is_favorited(self, obj):
-        return (
-            self.context['request'].user.is_authenticated
-            and obj.favorite.filter(
-                user=self.context['request'].user
-            ).exists()
-        )
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
+        relations = get_user_relations(self.context['request'])
+        return obj.pk in relations.favorite_ids
 
     def get_is_in_shopping_cart(self, obj):
-        return (
-            self.context['request'].user.is_authenticated
-            and obj.shopping_list.filter(
-                user=self.context['request'].user
-            ).exists()
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
+        relations = get_user_relations(self.context['request'])
+        return obj.pk in relations.shopping_cart_ids
+
+    def to_representation(self, instance):
+        """Передаём аннотацию подписки вложенному сериализатору автора."""
+        if hasattr(instance, 'author_is_subscribed'):
+            instance.author.is_subscribed = instance.author_is_subscribed
+        return super().to_representation(instance)
+
+
+class RecipeCoverageSerializer(RecipeSerializer):
+    """Сериализатор рецепта с долей имеющихся ингредиентов."""
+    coverage = serializers.SerializerMethodField()
+    missing_ingredients = serializers.SerializerMethodField()
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + (
+            'coverage',
+            'missing_ingredients'
         )
 
+    def get_coverage(self, obj):
+        return round(obj.coverage, 2)
+
+    def get_missing_ingredients(self, obj):
+        available = self.context['ingredient_ids']
+        ingredients = [
+            amount for amount in obj.amountingredient_set.all()
+            if amount.ingredient_id not in available
+        ]
+        serializer = FullAmountIngredientSerializer(ingredients, many=True)
+        return serializer.data
+
 
 class CreateAndUpdateRecipeSerializer(RecipeSerializer):
     """Сериализатор создания и обновления рецепта."""
@@ -143,9 +175,20 @@ class CreateAndUpdateRecipeSerializer(RecipeSerializer):
         return value
 
     def validate(self, data):
-        """Проверка пустых и одинаковых тегов, и ингридиентов."""
+        """Проверка пустых и одинаковых тегов, и ингридиентов.
+
+        При частичном обновлении проверяются только переданные поля.
+        """
         tags = data.get('tags', None)
         ingredients = data.get('ingredients', None)
+        if tags is not None or not self.partial:
+            self.check_tags(tags)
+        if ingredients is not None or not self.partial:
+            self.check_ingredients(ingredients)
+        return data
+
+    def check_tags(self, tags):
+        """Теги есть и не повторяются."""
         if not tags:
             raise exceptions.ValidationError(
                 'Нужно добавить тег рецепта.'
@@ -154,6 +197,9 @@ class CreateAndUpdateRecipeSerializer(RecipeSerializer):
             raise exceptions.ValidationError(
                 'У рецепта не может быть два одинаковых тега.'
             )
+
+    def check_ingredients(self, ingredients):
+        """Ингредиенты есть, не повторяются и существуют в базе."""
         if not ingredients:
             raise exceptions.ValidationError(
                 'Нужно добавить ингридиент рецепта.'
@@ -163,22 +209,30 @@ class CreateAndUpdateRecipeSerializer(RecipeSerializer):
             raise exceptions.ValidationError(
                 'У рецепта не может быть два одинаковых ингредиента.'
             )
-        return data
+        found = Ingredient.objects.in_bulk(ingredient_ids)
+        missing = [pk for pk in ingredient_ids if pk not in found]
+        if missing:
+            raise exceptions.ValidationError(
+                'Ингредиенты не найдены: '
+                + ', '.join(str(pk) for pk in missing) + '.'
+            )
+        for ingredient in ingredients:
+            ingredient['ingredient'] = found[ingredient['id']]
 
     def ingredients_create(self, recipe, ingredients):
         """Создание записи AmountIngredient."""
-        all_obj_amount = []
-        for ingredient in ingredients:
-            amount = ingredient['amount']
-            ingredient = get_object_or_404(Ingredient, pk=ingredient['id'])
-            obj_amount = AmountIngredient(
+        if not ingredients:
+            return
+        AmountIngredient.objects.bulk_create(
+            AmountIngredient(
                 recipe=recipe,
-                ingredient=ingredient,
-                amount=amount
+                ingredient=ingredient['ingredient'],
+                amount=ingredient['amount']
             )
-            all_obj_amount.append(obj_amount)
-        AmountIngredient.objects.bulk_create(all_obj_amount)
+            for ingredient in ingredients
+        )
 
+    @transaction.atomic
     def create(self, validated_data):
         author = self.context.get('request').user
         tags = validated_data.pop('tags')
@@ -188,20 +242,57 @@ class CreateAndUpdateRecipeSerializer(RecipeSerializer):
         self.ingredients_create(recipe, ingredients)
         return recipe
 
+    def tags_update(self, recipe, tags):
+        """Добавление и удаление только изменившихся тегов."""
+        current = set(recipe.tags.values_list('id', flat=True))
+        submitted = {tag.id for tag in tags}
+        if current - submitted:
+            recipe.tags.remove(*(current - submitted))
+        if submitted - current:
+            recipe.tags.add(*(submitted - current))
+
+    def ingredients_update(self, recipe, ingredients):
+        """Изменение только отличающихся записей AmountIngredient."""
+        current = {
+            amount.ingredient_id: amount
+            for amount in AmountIngredient.objects.filter(recipe=recipe)
+        }
+        submitted = {
+            ingredient['id']: ingredient for ingredient in ingredients
+        }
+        removed = current.keys() - submitted.keys()
+        if removed:
+            AmountIngredient.objects.filter(
+                recipe=recipe, ingredient_id__in=removed
+            ).delete()
+        self.ingredients_create(recipe, [
+            ingredient for pk, ingredient in submitted.items()
+            if pk not in current
+        ])
+        changed = []
+        for pk, amount in current.items():
+            if pk in submitted and amount.amount != submitted[pk]['amount']:
+                amount.amount = submitted[pk]['amount']
+                changed.append(amount)
+        if changed:
+            AmountIngredient.objects.bulk_update(changed, ('amount',))
+
+    @transaction.atomic
     def update(self, instance, validated_data):
-        tags = validated_data.pop('tags')
-        instance.tags.clear()
-        instance.tags.set(tags)
-        ingredients = validated_data.pop('ingredients')
-        instance.ingredients.clear()
-        self.ingredients_create(instance, ingredients)
+        tags = validated_data.pop('tags', None)
+        if tags is not None:
+            self.tags_update(instance, tags)
+        ingredients = validated_data.pop('ingredients', None)
+        if ingredients is not None:
+            self.ingredients_update(instance, ingredients)
         return super().update(instance, validated_data)
 
     def to_representation(self, instance):
-        serializer = RecipeSerializer(
-            instance,
-            context={'request': self.context.get('request')}
-        )
+        request = self.context.get('request')
+        instance = Recipe.objects.with_related().with_user_annotations(
+            request.user
+        ).get(pk=instance.pk)
+        serializer = RecipeSerializer(instance, context={'request': request})
         return serializer.data
 
 
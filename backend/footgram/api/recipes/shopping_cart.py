@@ -0,0 +1,80 @@
+import csv
+import json
+
+from django.db.models import Sum
+
+from recipes.models import AmountIngredient
+
+SHOPPING_CART_TITLE = 'Список покупок:'
+CHUNK_SIZE = 2000
+
+
+def get_shopping_cart(user):
+    """Суммарное количество каждого ингредиента в корзине пользователя."""
+    return AmountIngredient.objects.filter(
+        recipe__shopping_list__user=user
+    ).values(
+        'ingredient__name',
+        'ingredient__measurement_unit'
+    ).annotate(
+        total_amount=Sum('amount')
+    ).order_by(
+        'ingredient__name',
+        'ingredient__measurement_unit'
+    )
+
+
+def shopping_cart_rows(shopping_cart):
+    """Построчное чтение корзины без загрузки всей выборки в память."""
+    for item in shopping_cart.iterator(chunk_size=CHUNK_SIZE):
+        yield (
+            item['ingredient__name'],
+            item['total_amount'],
+            item['ingredient__measurement_unit']
+        )
+
+
+def stream_txt(rows):
+    """Список покупок в текстовом виде."""
+    yield f'{SHOPPING_CART_TITLE} \n'
+    for name, amount, measurement_unit in rows:
+        yield f'{name}, {amount} {measurement_unit}\n'
+
+
+class _Echo:
+    """Буфер для csv.writer, возвращающий записанную строку."""
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    """Список покупок в формате CSV."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(('name', 'amount', 'measurement_unit'))
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def stream_json(rows):
+    """Список покупок в формате JSON."""
+    yield '['
+    separator = ''
+    for name, amount, measurement_unit in rows:
+        yield separator + json.dumps(
+            {
+                'name': name,
+                'amount': amount,
+                'measurement_unit': measurement_unit
+            },
+            ensure_ascii=False
+        )
+        separator = ', '
+    yield ']'
+
+
+SHOPPING_CART_FORMATS = {
+    'txt': (stream_txt, 'text/plain; charset=utf-8'),
+    'csv': (stream_csv, 'text/csv; charset=utf-8'),
+    'json': (stream_json, 'application/json; charset=utf-8'),
+}
+DEFAULT_SHOPPING_CART_FORMAT = 'txt'
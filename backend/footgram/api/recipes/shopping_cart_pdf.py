@@ -0,0 +1,178 @@
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import lru_cache
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.utils import timezone
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+from api.recipes.shopping_cart import SHOPPING_CART_TITLE
+
+logger = logging.getLogger(__name__)
+
+PDF_FONT_NAME = 'ShoppingCartFont'
+PDF_JOB_TIMEOUT = 60 * 60
+PDF_JOB_PENDING = 'pending'
+PDF_JOB_DONE = 'done'
+PDF_JOB_FAILED = 'failed'
+
+
+@lru_cache(maxsize=None)
+def get_font():
+    """Регистрация шрифта с кириллицей, один раз на процесс."""
+    pdfmetrics.registerFont(
+        TTFont(PDF_FONT_NAME, settings.SHOPPING_CART_PDF_FONT)
+    )
+    return PDF_FONT_NAME
+
+
+@lru_cache(maxsize=None)
+def get_layout():
+    """Разметка страницы списка покупок, один раз на процесс."""
+    width, height = A4
+    margin = 20 * mm
+    line_height = 7 * mm
+    return {
+        'font': get_font(),
+        'title_size': 16,
+        'text_size': 12,
+        'left': margin,
+        'top': height - margin,
+        'bottom': margin,
+        'line_height': line_height,
+    }
+
+
+def render_pdf(rows):
+    """Список покупок в формате PDF.
+
+    rows - последовательность (название, количество, единица измерения).
+    """
+    layout = get_layout()
+    buffer = BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4, pageCompression=1)
+    pdf.setTitle(SHOPPING_CART_TITLE)
+    pdf.setFont(layout['font'], layout['title_size'])
+    pdf.drawString(layout['left'], layout['top'], SHOPPING_CART_TITLE)
+    y = layout['top'] - 2 * layout['line_height']
+    pdf.setFont(layout['font'], layout['text_size'])
+    for number, (name, amount, measurement_unit) in enumerate(rows, 1):
+        if y < layout['bottom']:
+            pdf.showPage()
+            pdf.setFont(layout['font'], layout['text_size'])
+            y = layout['top']
+        pdf.drawString(
+            layout['left'], y,
+            f'{number}. {name} ({measurement_unit}) — {amount}'
+        )
+        y -= layout['line_height']
+    pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+
+@lru_cache(maxsize=None)
+def get_executor():
+    """Пул потоков для фоновой генерации PDF."""
+    return ThreadPoolExecutor(
+        max_workers=settings.SHOPPING_CART_PDF_WORKERS,
+        thread_name_prefix='shopping-cart-pdf'
+    )
+
+
+@lru_cache(maxsize=None)
+def get_storage():
+    """Хранилище задач вне MEDIA_ROOT: файлы не раздаются nginx.
+
+    Состояние задачи - файлы <job>.pending, <job>.pdf и <job>.failed,
+    поэтому его видят все воркеры gunicorn с общим каталогом.
+    """
+    return FileSystemStorage(location=settings.SHOPPING_CART_PDF_ROOT)
+
+
+def _job_path(user_id, job_id, state):
+    extension = 'pdf' if state == PDF_JOB_DONE else state
+    return f'{user_id}/{job_id}.{extension}'
+
+
+def _is_expired(storage, path):
+    age = timezone.now() - storage.get_modified_time(path)
+    return age > timedelta(seconds=PDF_JOB_TIMEOUT)
+
+
+def remove_expired_jobs():
+    """Удалить файлы задач старше PDF_JOB_TIMEOUT, которые не забрали."""
+    storage = get_storage()
+    if not storage.exists(''):
+        return
+    for user_dir in storage.listdir('')[0]:
+        for name in storage.listdir(user_dir)[1]:
+            path = f'{user_dir}/{name}'
+            try:
+                if _is_expired(storage, path):
+                    storage.delete(path)
+            except FileNotFoundError:
+                pass
+
+
+def _render_job(user_id, job_id, rows):
+    """Генерация PDF в фоне и сохранение его в хранилище.
+
+    Метка pending удаляется последней, после записи PDF целиком.
+    """
+    storage = get_storage()
+    try:
+        storage.save(
+            _job_path(user_id, job_id, PDF_JOB_DONE),
+            ContentFile(render_pdf(rows))
+        )
+    except Exception:
+        logger.exception('Не удалось создать PDF списка покупок %s', job_id)
+        storage.save(
+            _job_path(user_id, job_id, PDF_JOB_FAILED), ContentFile(b'')
+        )
+    finally:
+        storage.delete(_job_path(user_id, job_id, PDF_JOB_PENDING))
+    remove_expired_jobs()
+
+
+def submit_pdf_job(user, rows):
+    """Поставить генерацию PDF в очередь, вернуть идентификатор задачи."""
+    job_id = uuid.uuid4().hex
+    get_storage().save(
+        _job_path(user.id, job_id, PDF_JOB_PENDING), ContentFile(b'')
+    )
+    get_executor().submit(_render_job, user.id, job_id, list(rows))
+    return job_id
+
+
+def pop_pdf_job(user, job_id):
+    """Статус задачи и готовый PDF, который удаляется из хранилища.
+
+    Возвращает (статус, содержимое) или (None, None),
+    если задача не найдена, устарела или принадлежит другому пользователю.
+    """
+    storage = get_storage()
+    pending = _job_path(user.id, job_id, PDF_JOB_PENDING)
+    if storage.exists(pending):
+        if _is_expired(storage, pending):
+            return PDF_JOB_FAILED, None
+        return PDF_JOB_PENDING, None
+    path = _job_path(user.id, job_id, PDF_JOB_DONE)
+    if storage.exists(path):
+        with storage.open(path, 'rb') as pdf_file:
+            content = pdf_file.read()
+        storage.delete(path)
+        return PDF_JOB_DONE, content
+    if storage.exists(_job_path(user.id, job_id, PDF_JOB_FAILED)):
+        return PDF_JOB_FAILED, None
+    return None, None
@@ -1,10 +1,13 @@
 from rest_framework import serializers
 
+from api.recipes.fields import ImageVariantField
 from recipes.models import Recipe
 
 
 class ShortRecipeSerializer(serializers.ModelSerializer):
     """Рецепты автора, сокращеннный вариант."""
+    image_thumbnail = ImageVariantField('thumbnail')
+    image_webp = ImageVariantField('webp')
 
     class Meta:
         model = Recipe
@@ -12,5 +15,7 @@ class ShortRecipeSerializer(serializers.ModelSerializer):
             'id',
             'name',
             'image',
+            'image_thumbnail',
+            'image_webp',
             'cooking_time'
         )
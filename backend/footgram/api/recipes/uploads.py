@@ -0,0 +1,72 @@
+from django.conf import settings
+from django.core.files.uploadhandler import (
+    StopUpload,
+    TemporaryFileUploadHandler
+)
+from PIL import Image
+from rest_framework import exceptions, status
+
+ALLOWED_IMAGE_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+
+
+class ImageTooLarge(exceptions.APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = 'Файл изображения слишком большой.'
+    default_code = 'image_too_large'
+
+
+class LimitedTemporaryFileUploadHandler(TemporaryFileUploadHandler):
+    """Запись загружаемого файла на диск кусками с ограничением размера.
+
+    Как только получено больше RECIPE_IMAGE_MAX_SIZE байт,
+    разбор запроса прерывается, и файл не попадает в request.FILES.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.received = 0
+        self.too_large = False
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.RECIPE_IMAGE_MAX_SIZE:
+            self.too_large = True
+            raise StopUpload(connection_reset=True)
+        return super().receive_data_chunk(raw_data, start)
+
+
+def check_content_length(request):
+    """Отказ до чтения тела запроса, если заявленный размер велик."""
+    try:
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        length = 0
+    if length > settings.RECIPE_IMAGE_MAX_SIZE:
+        raise ImageTooLarge()
+
+
+def validate_image_file(uploaded_file):
+    """Проверка формата и числа пикселей по заголовку файла.
+
+    Image.open читает только заголовок, поэтому слишком большое
+    изображение отклоняется без распаковки.
+    """
+    try:
+        with Image.open(uploaded_file) as image:
+            image_format = image.format
+            width, height = image.size
+            if width * height > settings.RECIPE_IMAGE_MAX_PIXELS:
+                raise exceptions.ValidationError(
+                    {'image': 'Слишком большое разрешение изображения.'}
+                )
+            image.verify()
+    except (OSError, SyntaxError, Image.DecompressionBombError):
+        raise exceptions.ValidationError(
+            {'image': 'Загрузите корректное изображение.'}
+        )
+    if image_format not in ALLOWED_IMAGE_FORMATS:
+        raise exceptions.ValidationError(
+            {'image': 'Допустимые форматы: '
+             + ', '.join(ALLOWED_IMAGE_FORMATS)}
+        )
+    uploaded_file.seek(0)
+    return image_format
@@ -1,8 +1,15 @@
-from django.http import HttpResponse
+import uuid
+
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import exceptions, permissions, status, viewsets
+from rest_framework import (
+    exceptions, filters, permissions, status, viewsets
+)
 from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 
 from api.recipes.filters import RecipeFilter
@@ -10,13 +17,48 @@ from api.recipes.permissions import OwnerOrReadOnly, ReadOnly
 from api.recipes.serializers import (
     CreateAndUpdateRecipeSerializer,
     FavoriteRecipeSerializer,
+    RecipeCoverageSerializer,
     RecipeSerializer,
     ShoppingListSerializer
 )
-from api.utils.paginators import PageLimitPaginator
-from recipes.models import (
-    AmountIngredient, FavoriteRecipe, Recipe, ShoppingList
+from api.recipes.shopping_cart import (
+    DEFAULT_SHOPPING_CART_FORMAT,
+    SHOPPING_CART_FORMATS,
+    get_shopping_cart,
+    shopping_cart_rows
+)
+from api.recipes.shopping_cart_pdf import (
+    PDF_JOB_DONE,
+    PDF_JOB_FAILED,
+    pop_pdf_job,
+    render_pdf,
+    submit_pdf_job
+)
+from api.recipes.uploads import (
+    ImageTooLarge,
+    LimitedTemporaryFileUploadHandler,
+    check_content_length,
+    validate_image_file
 )
+from api.utils.asynchronous import is_asgi_request
+from api.utils.negotiation import FileFormatNegotiation
+from api.utils.paginators import PageLimitPaginator
+from recipes.models import FavoriteRecipe, Recipe, ShoppingList
+
+
+def get_ingredient_ids(request):
+    """Множество id ингредиентов из параметров ingredients."""
+    try:
+        ingredient_ids = {
+            int(pk) for pk in request.query_params.getlist('ingredients')
+        }
+    except ValueError:
+        ingredient_ids = None
+    if not ingredient_ids:
+        raise exceptions.ValidationError(
+            {'ingredients': 'Нужно передать id ингредиентов.'}
+        )
+    return ingredient_ids
 
 
 class RecipeViewSet(viewsets.ModelViewSet):
@@ -25,8 +67,16 @@ class RecipeViewSet(viewsets.ModelViewSet):
     serializer_class = RecipeSerializer
     pagination_class = PageLimitPaginator
     permission_classes = (OwnerOrReadOnly,)
-    filter_backends = (DjangoFilterBackend,)
+    filter_backends = (DjangoFilterBackend, filters.OrderingFilter)
     filterset_class = RecipeFilter
+    ordering_fields = ('pub_date', 'favorites_count')
+    keyset_field = 'pub_date'
+
+    def get_queryset(self):
+        """Рецепты с автором, тегами, ингредиентами и флагами пользователя."""
+        return Recipe.objects.with_related().with_user_annotations(
+            self.request.user
+        )
 
     def get_serializer_class(self):
         """Определение метода работы с экземпляром."""
@@ -59,6 +109,49 @@ class RecipeViewSet(viewsets.ModelViewSet):
         ).delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @action(detail=True, methods=['PUT'], parser_classes=(MultiPartParser,))
+    def image(self, request, pk):
+        """Загрузка изображения рецепта файлом (multipart/form-data).
+
+        Файл пишется на диск кусками, размер и разрешение
+        проверяются до распаковки изображения.
+        """
+        recipe = self.get_object()
+        check_content_length(request)
+        handler = LimitedTemporaryFileUploadHandler(request)
+        request.upload_handlers = [handler]
+        image = request.FILES.get('image')
+        if handler.too_large:
+            raise ImageTooLarge()
+        if image is None:
+            raise exceptions.ValidationError(
+                {'image': 'Нужно добавить фото рецепта.'}
+            )
+        image_format = validate_image_file(image)
+        recipe.image.save(f'{uuid.uuid4()}.{image_format.lower()}', image)
+        serializer = RecipeSerializer(recipe, context={'request': request})
+        return Response(serializer.data)
+
+    @action(detail=False, methods=['GET'])
+    def match(self, request):
+        """Рецепты из имеющихся ингредиентов.
+
+        Сортировка по доле ингредиентов рецепта, которые есть
+        у пользователя; недостающие перечислены в missing_ingredients.
+        """
+        ingredient_ids = get_ingredient_ids(request)
+        queryset = self.get_queryset().with_coverage(ingredient_ids)
+        page = self.paginate_queryset(queryset)
+        serializer = RecipeCoverageSerializer(
+            page,
+            many=True,
+            context={
+                **self.get_serializer_context(),
+                'ingredient_ids': ingredient_ids
+            }
+        )
+        return self.get_paginated_response(serializer.data)
+
     @action(detail=True, methods=['POST'])
     def favorite(self, request, pk):
         """Добавление рецепта в избранное."""
@@ -97,31 +190,88 @@ class RecipeViewSet(viewsets.ModelViewSet):
         detail=False,
         methods=['GET'],
         permission_classes=(permissions.IsAuthenticated,),
+        content_negotiation_class=FileFormatNegotiation,
     )
     def download_shopping_cart(self, request):
-        """Загрузить список покупок."""
-        user = request.user
-        shopping_list = AmountIngredient.objects.filter(
-            recipe__in=ShoppingList.objects.filter(
-                user=user
-            ).values(
-                'recipe'
-            )).select_related('ingredient').all()
-
-        shopping_list_text = 'Список покупок: \n'
-
-        for item in shopping_list:
-            shopping_list_text += (
-                f'{item.ingredient.name}, {item.amount} '
-                f'{item.ingredient.measurement_unit}\n'
+        """Загрузить список покупок в формате txt, csv, json или pdf."""
+        file_format = request.query_params.get(
+            'format', DEFAULT_SHOPPING_CART_FORMAT
+        )
+        if file_format == 'pdf':
+            return self.download_shopping_cart_pdf(request)
+        if file_format not in SHOPPING_CART_FORMATS:
+            raise exceptions.ValidationError(
+                {'format': 'Доступные форматы: '
+                 + ', '.join((*SHOPPING_CART_FORMATS, 'pdf'))}
             )
+        stream, content_type = SHOPPING_CART_FORMATS[file_format]
+        rows = shopping_cart_rows(get_shopping_cart(request.user))
+        if is_asgi_request(request):
+            # Под ASGI Django 3.2 перебирает потоковый ответ в цикле
+            # событий, где запросы к базе запрещены: строки читаются здесь.
+            rows = list(rows)
+        response = StreamingHttpResponse(
+            stream(rows), content_type=content_type
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename=shopping-list.{file_format}'
+        )
+        return response
 
-        response = HttpResponse(shopping_list_text, content_type="text/plain")
+    @staticmethod
+    def pdf_response(content):
+        """Ответ с PDF-файлом списка покупок."""
+        response = HttpResponse(content, content_type='application/pdf')
         response['Content-Disposition'] = (
-            'attachment; filename=shopping-list.txt'
+            'attachment; filename=shopping-list.pdf'
         )
         return response
 
+    def download_shopping_cart_pdf(self, request):
+        """Список покупок в PDF.
+
+        Большие списки создаются в фоне: клиент получает 202
+        и адрес, по которому нужно забрать готовый файл.
+        """
+        rows = list(shopping_cart_rows(get_shopping_cart(request.user)))
+        if len(rows) <= settings.SHOPPING_CART_PDF_ASYNC_THRESHOLD:
+            return self.pdf_response(render_pdf(rows))
+        job_id = submit_pdf_job(request.user, rows)
+        return self.pdf_job_pending_response(request, job_id)
+
+    @staticmethod
+    def pdf_job_pending_response(request, job_id):
+        """Ответ 202 с адресом проверки готовности PDF."""
+        url = request.build_absolute_uri(
+            reverse('api:recipe-download-shopping-cart-job', args=(job_id,))
+        )
+        return Response(
+            {'status': 'pending', 'url': url},
+            status=status.HTTP_202_ACCEPTED,
+            headers={'Location': url}
+        )
+
+    @action(
+        detail=False,
+        methods=['GET'],
+        permission_classes=(permissions.IsAuthenticated,),
+        url_path=r'download_shopping_cart/(?P<job_id>[0-9a-f]{32})',
+    )
+    def download_shopping_cart_job(self, request, job_id):
+        """Забрать PDF списка покупок, созданный в фоне."""
+        job_status, content = pop_pdf_job(request.user, job_id)
+        if job_status is None:
+            raise exceptions.NotFound('Задача не найдена.')
+        if job_status == PDF_JOB_DONE:
+            return self.pdf_response(content)
+        if job_status == PDF_JOB_FAILED:
+            return Response(
+                {'status': job_status,
+                 'errors': 'Не удалось создать список покупок.'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        return self.pdf_job_pending_response(request, job_id)
+
     def get_permissions(self):
         """Выбор ограничения."""
         if self.action == 'retrieve':
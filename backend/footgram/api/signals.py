@@ -0,0 +1,34 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from api.utils.authentication import forget_tokens
+from api.utils.versions import bump_model_version
+from recipes.models import Ingredient, Tag, User
+
+
+@receiver((post_save, post_delete), sender=Tag)
+@receiver((post_save, post_delete), sender=Ingredient)
+def catalog_changed(sender, **kwargs):
+    """Сменить версию справочника после изменения в админке."""
+    bump_model_version(sender)
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    """Убрать токен из кэша после выхода (djoser token/logout)."""
+    forget_tokens([instance.key])
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, created, update_fields, **kwargs):
+    """Убрать из кэша токены пользователя после его изменения.
+
+    В кэше токен хранится вместе с пользователем, поэтому сбрасывается
+    после любого сохранения, кроме обновления last_login при входе.
+    """
+    if created or update_fields == frozenset(('last_login',)):
+        return
+    forget_tokens(
+        Token.objects.filter(user=instance).values_list('key', flat=True)
+    )
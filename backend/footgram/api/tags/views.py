@@ -1,10 +1,11 @@
 from rest_framework import viewsets
 
 from api.tags.serializers import TagSerializer
+from api.utils.mixins import CachedResponseMixin
 from recipes.models import Tag
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(CachedResponseMixin, viewsets.ReadOnlyModelViewSet):
     """Вьюсет Тегов."""
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
@@ -0,0 +1,211 @@
+from django.contrib.auth.models import update_last_login
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.utils.authentication import (
+    CachedTokenAuthentication, _cache_key, get_token_cache
+)
+from recipes.models import (
+    AmountIngredient, FavoriteRecipe, Ingredient, Recipe, ShoppingList, Tag,
+    User
+)
+from users.models import Follow
+
+RECIPES_COUNT = 12
+
+
+class RecipeQueryCountTests(TestCase):
+    """Число SQL-запросов рецептов не зависит от размера страницы."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='reader', email='reader@example.com',
+            first_name='Читатель', last_name='Рецептов', password='password'
+        )
+        authors = [
+            User.objects.create_user(
+                username=f'author{number}',
+                email=f'author{number}@example.com',
+                first_name='Автор', last_name=str(number),
+                password='password'
+            )
+            for number in range(3)
+        ]
+        tags = [
+            Tag.objects.create(
+                name=f'Тег {number}', color=f'#00000{number}',
+                slug=f'tag{number}'
+            )
+            for number in range(2)
+        ]
+        ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {number}', measurement_unit='г'
+            )
+            for number in range(3)
+        ]
+        for number in range(RECIPES_COUNT):
+            recipe = Recipe.objects.create(
+                author=authors[number % len(authors)],
+                name=f'Рецепт {number}',
+                image='recipes/test.jpg',
+                text='Описание',
+                cooking_time=10
+            )
+            recipe.tags.set(tags)
+            AmountIngredient.objects.bulk_create(
+                AmountIngredient(
+                    recipe=recipe, ingredient=ingredient, amount=100
+                )
+                for ingredient in ingredients
+            )
+            if number % 2:
+                FavoriteRecipe.objects.create(user=cls.user, recipe=recipe)
+                ShoppingList.objects.create(user=cls.user, recipe=recipe)
+        Follow.objects.create(user=cls.user, author=authors[0])
+        cls.recipe = Recipe.objects.order_by('id').first()
+
+    def setUp(self):
+        self.anonymous = APIClient()
+        self.authorized = APIClient()
+        self.authorized.force_authenticate(self.user)
+
+    def assert_list_queries(self, client, queries):
+        for limit in (2, 10):
+            with self.subTest(limit=limit):
+                with self.assertNumQueries(queries):
+                    response = client.get(f'/api/recipes/?limit={limit}')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.data['results']), limit)
+
+    def test_list_anonymous(self):
+        """COUNT, рецепты с авторами, теги, ингредиенты."""
+        self.assert_list_queries(self.anonymous, 4)
+
+    def test_list_authorized(self):
+        """Флаги избранного, корзины и подписки - подзапросы EXISTS."""
+        self.assert_list_queries(self.authorized, 4)
+
+    def test_retrieve_anonymous(self):
+        with self.assertNumQueries(3):
+            response = self.anonymous.get(f'/api/recipes/{self.recipe.pk}/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_retrieve_authorized(self):
+        with self.assertNumQueries(3):
+            response = self.authorized.get(
+                f'/api/recipes/{self.recipe.pk}/'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['author']['is_subscribed'])
+
+
+class SubscriptionsTests(TestCase):
+    """Подписки с последними рецептами авторов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.author = (
+            User.objects.create_user(
+                username=username, email=f'{username}@example.com',
+                first_name='Имя', last_name='Фамилия', password='password'
+            )
+            for username in ('reader', 'author')
+        )
+        for number in range(3):
+            Recipe.objects.create(
+                author=cls.author, name=f'Рецепт {number}',
+                image='recipes/test.jpg', text='Описание', cooking_time=10
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_without_follows(self):
+        response = self.client.get(
+            '/api/users/subscriptions/?recipes_limit=3'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], [])
+
+    def test_recipes_limit(self):
+        Follow.objects.create(user=self.user, author=self.author)
+        response = self.client.get(
+            '/api/users/subscriptions/?recipes_limit=2'
+        )
+        self.assertEqual(response.status_code, 200)
+        [author] = response.data['results']
+        self.assertEqual(len(author['recipes']), 2)
+
+
+class TokenCacheTests(TestCase):
+    """Кэш токенов и их отзыв."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='reader', email='reader@example.com',
+            first_name='Читатель', last_name='Рецептов', password='password'
+        )
+
+    def setUp(self):
+        cache.clear()
+        get_token_cache().clear()
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def assert_status(self, status_code):
+        response = self.client.get('/api/users/me/')
+        self.assertEqual(response.status_code, status_code)
+
+    def test_logout_in_other_worker(self):
+        """Запись в кэше этого воркера не переживает выход в другом."""
+        self.assert_status(200)
+        key = _cache_key(self.token.key)
+        cached = get_token_cache().get(key)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.token.delete()
+        get_token_cache().set(key, cached)
+        self.assert_status(401)
+
+    def test_deactivation(self):
+        self.assert_status(200)
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.assert_status(401)
+
+    def test_profile_update(self):
+        """В кэше не остаётся пользователь со старыми данными."""
+        self.assert_status(200)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                '/api/users/me/', {'first_name': 'Писатель'}
+            )
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get('/api/users/me/')
+        self.assertEqual(response.data['first_name'], 'Писатель')
+
+    def test_last_login(self):
+        """Вход обновляет last_login без запроса токенов."""
+        user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(1):
+            update_last_login(None, user)
+
+    def test_logout_keeps_other_tokens(self):
+        """Выход сбрасывает в кэше только свой токен."""
+        other = Token.objects.create(user=User.objects.create_user(
+            username='writer', email='writer@example.com',
+            first_name='Писатель', last_name='Рецептов', password='password'
+        ))
+        authentication = CachedTokenAuthentication()
+        authentication.authenticate_credentials(other.key)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.token.delete()
+        with self.assertNumQueries(0):
+            authentication.authenticate_credentials(other.key)
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework import routers
 
@@ -5,6 +6,8 @@ from .ingredients.views import IngredientViewSet
 from .recipes.views import RecipeViewSet
 from .tags.views import TagViewSet
 from .users.views import CustomUserViewSet
+from .utils.asynchronous import async_urlpatterns
+from .utils.instrumentation import metrics_view
 
 app_name = 'api'
 
@@ -14,12 +17,28 @@ router.register('tags', TagViewSet)
 router.register('ingredients', IngredientViewSet)
 router.register('recipes', RecipeViewSet)
 
+# Маршруты чтения, которые при ASYNC_VIEWS обслуживаются асинхронно.
+ASYNC_ROUTES = (
+    'recipe-list',
+    'recipe-detail',
+    'tag-list',
+    'tag-detail',
+    'ingredient-list',
+    'ingredient-detail',
+    'customuser-subscriptions',
+)
+
+router_urls = router.urls
+if settings.ASYNC_VIEWS:
+    router_urls = async_urlpatterns(router_urls, ASYNC_ROUTES)
+
 djoser = [
     path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken'))
 ]
 
 urlpatterns = [
-    path('', include(router.urls)),
+    path('metrics', metrics_view, name='metrics'),
+    path('', include(router_urls)),
     path('', include(djoser)),
 ]
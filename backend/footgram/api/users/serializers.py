@@ -4,11 +4,28 @@ from rest_framework import serializers, exceptions
 from rest_framework.validators import UniqueTogetherValidator
 
 from api.recipes.short_recipe_serializer import ShortRecipeSerializer
+from api.utils.relations import get_user_relations
 from users.models import Follow
 
 User = get_user_model()
 
 
+def get_recipes_limit(request):
+    """Значение параметра recipes_limit или None."""
+    recipes_limit = request.query_params.get('recipes_limit')
+    if not recipes_limit:
+        return None
+    try:
+        recipes_limit = int(recipes_limit)
+    except ValueError:
+        recipes_limit = 0
+    if recipes_limit < 1:
+        raise exceptions.ValidationError(
+            {'recipes_limit': 'Должно быть целым числом больше 0.'}
+        )
+    return recipes_limit
+
+
 class CustomCreateUserSerializer(UserCreateSerializer):
     """Сериализатор добавления пользователя, унаследовано от djoser."""
     class Meta:
@@ -42,12 +59,10 @@ class CustomUserSerializer(UserSerializer):
         """Вычисляем подписан ли текущий пользователь
          (от имени которого производися запрос)
          на пользователя по которому производим запрос."""
-
-        if self.context.get('request').user.is_authenticated:
-            return obj.following.filter(
-                user=self.context.get('request').user
-            ).exists()
-        return False
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+        relations = get_user_relations(self.context.get('request'))
+        return obj.pk in relations.following_ids
 
 
 class FollowListSerializer(CustomUserSerializer):
@@ -70,16 +85,18 @@ class FollowListSerializer(CustomUserSerializer):
 
     def get_recipes(self, obj):
         """Получение объекта рецепта."""
+        if hasattr(obj, 'recent_recipes'):
+            return ShortRecipeSerializer(obj.recent_recipes, many=True).data
         request = self.context.get('request')
-        recipes_limit = request.GET.get('recipes_limit')
+        recipes_limit = get_recipes_limit(request)
         queryset = obj.recipes.all()
         if recipes_limit:
-            queryset = queryset[:int(recipes_limit)]
+            queryset = queryset[:recipes_limit]
         return ShortRecipeSerializer(queryset, many=True).data
 
     def get_recipes_count(self, obj):
         """Получение колличесва рецептов."""
-        return obj.recipes.count()
+        return obj.recipes_count
 
 
 class FollowSerializer(serializers.ModelSerializer):
@@ -1,12 +1,20 @@
+from collections import defaultdict
+
 from django.contrib.auth import get_user_model
+from django.db.models import BooleanField, Value
 from django.shortcuts import get_object_or_404
 from djoser.views import UserViewSet
 from rest_framework import permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
-from api.users.serializers import FollowSerializer, FollowListSerializer
+from api.users.serializers import (
+    FollowListSerializer,
+    FollowSerializer,
+    get_recipes_limit
+)
 from api.utils.paginators import PageLimitPaginator
+from recipes.models import Recipe
 from users.models import Follow
 
 User = get_user_model()
@@ -19,8 +27,18 @@ class CustomUserViewSet(UserViewSet):
     @action(detail=False, permission_classes=[permissions.IsAuthenticated])
     def subscriptions(self, request):
         """Мои подписки."""
-        queryset = User.objects.filter(following__user=request.user)
+        queryset = User.objects.filter(
+            following__user=request.user
+        ).annotate(
+            is_subscribed=Value(True, output_field=BooleanField())
+        ).order_by('id')
         page = self.paginate_queryset(queryset)
+        recipes_limit = get_recipes_limit(request)
+        recent_recipes = defaultdict(list)
+        for recipe in Recipe.objects.latest_for_authors(page, recipes_limit):
+            recent_recipes[recipe.author_id].append(recipe)
+        for author in page:
+            author.recent_recipes = recent_recipes[author.id]
         serializer = FollowListSerializer(
             page, many=True, context={'request': request}
         )
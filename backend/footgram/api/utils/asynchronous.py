@@ -0,0 +1,72 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import close_old_connections
+from django.urls import URLPattern
+
+from api.utils.db import check_connections
+
+
+@lru_cache(maxsize=None)
+def get_executor():
+    return ThreadPoolExecutor(
+        max_workers=settings.ASYNC_VIEW_WORKERS,
+        thread_name_prefix='async-view'
+    )
+
+
+def is_asgi_request(request):
+    """Запрос пришёл через ASGI (request - HttpRequest или Request DRF)."""
+    return isinstance(getattr(request, '_request', request), ASGIRequest)
+
+
+def _run_view(view, request, *args, **kwargs):
+    """Вызов синхронного view в потоке пула вместе с отрисовкой ответа.
+
+    Соединения с базой в потоке пула проверяются и закрываются по тем же
+    правилам CONN_MAX_AGE, что и в обычном обработчике запроса.
+    """
+    if settings.DB_CONN_HEALTH_CHECKS:
+        check_connections()
+    try:
+        response = view(request, *args, **kwargs)
+        if hasattr(response, 'render') and callable(response.render):
+            response.render()
+        return response
+    finally:
+        close_old_connections()
+
+
+def async_view(view):
+    """Асинхронная обёртка view для ASGI.
+
+    В Django 3.2 нет асинхронного ORM, поэтому запросы к базе и
+    сериализация выполняются в ограниченном пуле ASYNC_VIEW_WORKERS,
+    а цикл событий свободен для медленных клиентов.
+    """
+    run = sync_to_async(
+        _run_view, thread_sensitive=False, executor=get_executor()
+    )
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        return await run(view, request, *args, **kwargs)
+    return wrapper
+
+
+def async_urlpatterns(urlpatterns, names):
+    """Маршруты с именами из names обслуживаются через async_view."""
+    return [
+        URLPattern(
+            pattern.pattern,
+            async_view(pattern.callback),
+            pattern.default_args,
+            pattern.name
+        )
+        if isinstance(pattern, URLPattern) and pattern.name in names
+        else pattern
+        for pattern in urlpatterns
+    ]
@@ -0,0 +1,61 @@
+import time
+from hashlib import sha256
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.authentication import TokenAuthentication
+
+from api.utils.versions import bump_version, get_version
+from recipes.models import ModelVersion
+
+TOKEN_CACHE_KEY = 'auth_token:{digest}'
+
+
+def _cache_key(key):
+    return TOKEN_CACHE_KEY.format(digest=sha256(key.encode()).hexdigest())
+
+
+def get_token_cache():
+    return caches[settings.TOKEN_CACHE]
+
+
+def forget_tokens(keys):
+    """Удалить токены из кэша после выхода или изменения пользователя.
+
+    Смена версии токена сбрасывает его в кэше других воркеров
+    не позже чем через MODEL_VERSION_CACHE_TIMEOUT секунд. Версии
+    старше срока жизни кэша токенов больше не нужны и удаляются.
+    """
+    cache = get_token_cache()
+    cache_keys = [_cache_key(key) for key in keys]
+    cache.delete_many(cache_keys)
+    for cache_key in cache_keys:
+        bump_version(cache_key)
+    if cache.default_timeout is not None:
+        ModelVersion.objects.filter(
+            label__startswith=TOKEN_CACHE_KEY.format(digest=''),
+            version__lt=time.time_ns() - cache.default_timeout * 10 ** 9
+        ).delete()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication с кэшем токена вместе с пользователем.
+
+    Срок жизни и размер кэша задаются в CACHES[TOKEN_CACHE]: для
+    LocMemCache это TIMEOUT и MAX_ENTRIES с вытеснением давно
+    не использованных записей. Токен хранится с версией и
+    перечитывается из базы после выхода или изменения пользователя
+    в любом воркере.
+    """
+
+    def authenticate_credentials(self, key):
+        cache = get_token_cache()
+        cache_key = _cache_key(key)
+        version = get_version(cache_key, create=False)
+        cached = cache.get(cache_key)
+        if cached is None or cached[0] != version:
+            user, token = super().authenticate_credentials(key)
+            cache.set(cache_key, (version, token))
+            return user, token
+        token = cached[1]
+        return token.user, token
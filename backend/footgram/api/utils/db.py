@@ -0,0 +1,155 @@
+import asyncio
+from contextvars import ContextVar
+from functools import lru_cache
+from hashlib import sha256
+from itertools import cycle
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Error
+from django.db import connections
+from django.urls import Resolver404, resolve
+from rest_framework.permissions import SAFE_METHODS
+
+# Модели, которые всегда читаются с основной базы: токен, созданный
+# при входе, может ещё не дойти до реплики, а версия справочника
+# не должна меняться от реплики к реплике.
+PRIMARY_MODELS = ('authtoken.token', 'recipes.modelversion')
+# Вьюсеты, GET-запросы к которым читают данные с реплик.
+REPLICA_VIEWSETS = (
+    'api.recipes.views.RecipeViewSet',
+    'api.tags.views.TagViewSet',
+    'api.ingredients.views.IngredientViewSet',
+    'api.users.views.CustomUserViewSet',
+)
+STICKY_CACHE_KEY = 'db_primary:{client}'
+
+_replica = ContextVar('db_replica', default=None)
+
+
+@lru_cache(maxsize=None)
+def get_replicas():
+    return cycle(settings.DATABASE_REPLICAS)
+
+
+def get_sticky_key(request):
+    """Ключ кеша клиента по заголовку Authorization."""
+    authorization = request.META.get('HTTP_AUTHORIZATION')
+    if authorization:
+        return STICKY_CACHE_KEY.format(
+            client=sha256(authorization.encode()).hexdigest()
+        )
+    return None
+
+
+def select_replica(request):
+    """Реплика для запроса или None, если читать нужно с основной базы.
+
+    Клиент, недавно изменивший данные, читает с основной базы
+    DATABASE_REPLICA_STICKY_SECONDS секунд, чтобы не увидеть
+    устаревшие is_favorited и is_subscribed.
+    """
+    if request.method not in SAFE_METHODS:
+        return None
+    try:
+        match = resolve(request.path_info, getattr(request, 'urlconf', None))
+    except Resolver404:
+        return None
+    view = getattr(match.func, 'cls', None)
+    if (view is None
+            or f'{view.__module__}.{view.__name__}' not in REPLICA_VIEWSETS):
+        return None
+    key = get_sticky_key(request)
+    if key is not None and cache.get(key):
+        return None
+    return next(get_replicas())
+
+
+def remember_write(request, response):
+    """Закрепить клиента за основной базой после успешной записи."""
+    if request.method in SAFE_METHODS or response.status_code >= 400:
+        return
+    key = get_sticky_key(request)
+    if key is not None:
+        cache.set(key, True, settings.DATABASE_REPLICA_STICKY_SECONDS)
+
+
+def check_replica_cache(app_configs, **kwargs):
+    """Отметка о записи клиента должна быть видна всем воркерам.
+
+    В кеше в памяти процесса её видит только воркер, принявший запись:
+    следующий запрос на другом воркере прочитает устаревшую реплику.
+    """
+    if (settings.DATABASE_REPLICAS
+            and isinstance(caches[DEFAULT_CACHE_ALIAS], LocMemCache)):
+        return [Error(
+            'Реплики для чтения требуют общего кеша по умолчанию.',
+            hint='Задайте CACHE_BACKEND, например, Redis или Memcached.',
+            id='api.E001',
+        )]
+    return []
+
+
+def check_connections(**kwargs):
+    """Закрыть переиспользуемые соединения, которые перестали отвечать.
+
+    Аналог CONN_HEALTH_CHECKS из Django 4.1, подключается
+    к request_started при DB_CONN_HEALTH_CHECKS.
+    """
+    for connection in connections.all():
+        if (connection.connection is not None
+                and not connection.in_atomic_block
+                and not connection.is_usable()):
+            connection.close()
+
+
+class ReplicaRouter:
+    """Чтение с реплики, выбранной ReplicaMiddleware для запроса."""
+
+    def db_for_read(self, model, **hints):
+        alias = _replica.get()
+        if alias is not None and model._meta.label_lower not in PRIMARY_MODELS:
+            return alias
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
+
+
+class ReplicaMiddleware:
+    """Выбирает реплику по кругу для GET-запросов к REPLICA_VIEWSETS."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(self.get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        token = _replica.set(select_replica(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            _replica.reset(token)
+        remember_write(request, response)
+        return response
+
+    async def __acall__(self, request):
+        token = _replica.set(select_replica(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            _replica.reset(token)
+        remember_write(request, response)
+        return response
@@ -0,0 +1,406 @@
+import asyncio
+import atexit
+import fcntl
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+from pathlib import Path
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.http import Http404, HttpResponse
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10
+)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (
+    256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304
+)
+# Имя метрики: описание, границы корзин, поле RequestMetrics.
+HISTOGRAMS = {
+    'footgram_request_duration_seconds': (
+        'Время обработки запроса.', DURATION_BUCKETS, 'duration'
+    ),
+    'footgram_request_db_seconds': (
+        'Время SQL-запросов за запрос.', DURATION_BUCKETS, 'db_time'
+    ),
+    'footgram_request_queries': (
+        'Число SQL-запросов за запрос.', QUERY_BUCKETS, 'queries'
+    ),
+    'footgram_request_duplicate_queries': (
+        'Число повторов одинаковых SQL-запросов за запрос.',
+        QUERY_BUCKETS, 'duplicates'
+    ),
+    'footgram_request_serializer_seconds': (
+        'Время сериализаторов за запрос.', DURATION_BUCKETS,
+        'serializer_time'
+    ),
+    'footgram_response_size_bytes': (
+        'Размер ответа.', SIZE_BUCKETS, 'size'
+    ),
+}
+IN_PLACEHOLDERS = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+# Как часто воркер сохраняет свои показатели в REQUEST_METRICS_DIR, секунд.
+SNAPSHOT_INTERVAL = 1
+# Показатели завершившихся воркеров, чтобы счётчики не уменьшались.
+ARCHIVE_NAME = 'archive.json'
+
+_current = ContextVar('request_metrics', default=None)
+
+
+def fingerprint(sql):
+    """SQL без различий в длине списков IN (%s, ...)."""
+    return IN_PLACEHOLDERS.sub('(...)', sql)
+
+
+class RequestMetrics:
+    """Показатели одного запроса."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.duration = 0
+        self.queries = 0
+        self.db_time = 0
+        self.fingerprints = Counter()
+        self.serializing = False
+        self.serializer_time = 0
+        self.view_finished = None
+        self.size = 0
+
+    @property
+    def duplicates(self):
+        return sum(
+            count - 1 for count in self.fingerprints.values() if count > 1
+        )
+
+    @property
+    def render_time(self):
+        if self.view_finished is None:
+            return 0
+        return self.started + self.duration - self.view_finished
+
+    def __call__(self, execute, sql, params, many, context):
+        """Обёртка execute_wrapper: время и отпечаток SQL-запроса."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+
+class Histogram:
+    """Гистограмма в формате Prometheus с разбивкой по меткам."""
+
+    def __init__(self, name, description, buckets):
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        self.series = defaultdict(
+            lambda: [[0] * (len(buckets) + 1), 0]
+        )
+
+    def observe(self, labels, value):
+        series = self.series[labels]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self):
+        lines = [
+            f'# HELP {self.name} {self.description}',
+            f'# TYPE {self.name} histogram',
+        ]
+        for labels, (counts, total) in sorted(self.series.items()):
+            label = ','.join(f'{key}="{value}"' for key, value in labels)
+            cumulative = 0
+            for bound, count in zip(
+                    (*self.buckets, '+Inf'), counts):
+                cumulative += count
+                lines.append(
+                    f'{self.name}_bucket{{{label},le="{bound}"}} '
+                    f'{cumulative}'
+                )
+            lines.append(f'{self.name}_sum{{{label}}} {total}')
+            lines.append(f'{self.name}_count{{{label}}} {cumulative}')
+        return lines
+
+
+class MetricsRegistry:
+    """Накопленные показатели процесса."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {
+            name: (Histogram(name, description, buckets), field)
+            for name, (description, buckets, field) in HISTOGRAMS.items()
+        }
+        self.requests = Counter()
+        self.changed = False
+        self.saver_pid = None
+
+    def observe(self, view, method, status, metrics):
+        labels = (('view', view), ('method', method))
+        with self.lock:
+            self.requests[(*labels, ('status', str(status)))] += 1
+            for histogram, field in self.histograms.values():
+                histogram.observe(labels, getattr(metrics, field))
+            self.changed = True
+            if self.saver_pid != os.getpid():
+                # Поток запускается в каждом воркере после fork.
+                self.saver_pid = os.getpid()
+                threading.Thread(
+                    target=self.save_periodically,
+                    name='request-metrics',
+                    daemon=True
+                ).start()
+
+    def save_periodically(self):
+        while True:
+            time.sleep(SNAPSHOT_INTERVAL)
+            if self.changed:
+                self.save()
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'requests': [
+                    [labels, count] for labels, count in self.requests.items()
+                ],
+                'histograms': {
+                    name: [
+                        [labels, counts, total]
+                        for labels, (counts, total) in histogram.series.items()
+                    ]
+                    for name, (histogram, _) in self.histograms.items()
+                },
+            }
+
+    def merge(self, snapshot):
+        """Добавить показатели из snapshot() другого процесса."""
+        with self.lock:
+            for labels, count in snapshot['requests']:
+                self.requests[tuple(map(tuple, labels))] += count
+            for name, series in snapshot['histograms'].items():
+                histogram, _ = self.histograms[name]
+                for labels, counts, total in series:
+                    current = histogram.series[tuple(map(tuple, labels))]
+                    current[0] = [a + b for a, b in zip(current[0], counts)]
+                    current[1] += total
+
+    def save(self):
+        """Сохранить показатели процесса в REQUEST_METRICS_DIR."""
+        self.changed = False
+        path = Path(settings.REQUEST_METRICS_DIR) / f'{os.getpid()}.json'
+        write_snapshot(path, self.snapshot())
+
+    def render(self):
+        lines = [
+            '# HELP footgram_requests_total Число запросов.',
+            '# TYPE footgram_requests_total counter',
+        ]
+        with self.lock:
+            for labels, count in sorted(self.requests.items()):
+                label = ','.join(f'{key}="{value}"' for key, value in labels)
+                lines.append(f'footgram_requests_total{{{label}}} {count}')
+            for histogram, _ in self.histograms.values():
+                lines.extend(histogram.render())
+        return '\n'.join(lines) + '\n'
+
+
+def write_snapshot(path, snapshot):
+    temporary = path.with_name(f'.{path.name}')
+    temporary.write_text(json.dumps(snapshot))
+    os.replace(temporary, path)
+
+
+def is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def collect():
+    """Показатели всех воркеров из REQUEST_METRICS_DIR.
+
+    Файлы завершившихся воркеров переносятся в archive.json.
+    """
+    registry.save()
+    directory = Path(settings.REQUEST_METRICS_DIR)
+    total = MetricsRegistry()
+    with open(directory / '.lock', 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        archive_path = directory / ARCHIVE_NAME
+        archive = MetricsRegistry()
+        if archive_path.exists():
+            archive.merge(json.loads(archive_path.read_text()))
+        finished = []
+        for path in directory.glob('*.json'):
+            if path.name == ARCHIVE_NAME:
+                continue
+            snapshot = json.loads(path.read_text())
+            if is_alive(int(path.stem)):
+                total.merge(snapshot)
+            else:
+                archive.merge(snapshot)
+                finished.append(path)
+        if finished:
+            write_snapshot(archive_path, archive.snapshot())
+            for path in finished:
+                path.unlink()
+    total.merge(archive.snapshot())
+    return total
+
+
+registry = MetricsRegistry()
+
+_serializer_data = serializers.BaseSerializer.data
+
+
+def _timed_serializer_data(self):
+    """serializer.data с замером времени верхнего сериализатора."""
+    metrics = _current.get()
+    if metrics is None or metrics.serializing:
+        return _serializer_data.fget(self)
+    metrics.serializing = True
+    started = time.perf_counter()
+    try:
+        return _serializer_data.fget(self)
+    finally:
+        metrics.serializer_time += time.perf_counter() - started
+        metrics.serializing = False
+
+
+def record_query(execute, sql, params, many, context):
+    """Обёртка execute_wrapper всех соединений.
+
+    Запрос учитывается, только если он выполняется для замеряемого
+    HTTP-запроса, в том числе из потока пула асинхронных view.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics(execute, sql, params, many, context)
+
+
+def add_query_wrapper(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def install():
+    """Подключить замер SQL-запросов и времени сериализаторов DRF."""
+    serializers.BaseSerializer.data = property(_timed_serializer_data)
+    connection_created.connect(add_query_wrapper)
+    os.makedirs(settings.REQUEST_METRICS_DIR, exist_ok=True)
+    atexit.register(registry.save)
+
+
+class RequestMetricsMiddleware:
+    """Число и время SQL-запросов, повторы, время сериализации и размер ответа.
+
+    Замеряется доля запросов REQUEST_METRICS_SAMPLE_RATE, остальные
+    проходят без накладных расходов. Показатели отдаются в заголовке
+    Server-Timing, в журнал и в гистограммы /api/metrics.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = settings.REQUEST_METRICS_SAMPLE_RATE
+        if asyncio.iscoroutinefunction(self.get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        if random.random() >= self.sample_rate:
+            return await self.get_response(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics)
+
+    def finish(self, request, response, metrics):
+        metrics.duration = time.perf_counter() - metrics.started
+        if not response.streaming:
+            metrics.size = len(response.content)
+        self.report(request, response, metrics)
+        return response
+
+    def process_template_response(self, request, response):
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.view_finished = time.perf_counter()
+        return response
+
+    def report(self, request, response, metrics):
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        registry.observe(view, request.method, response.status_code, metrics)
+        response['Server-Timing'] = ', '.join((
+            f'db;dur={metrics.db_time * 1000:.1f};'
+            f'desc="{metrics.queries} queries"',
+            f'serialize;dur={metrics.serializer_time * 1000:.1f}',
+            f'render;dur={metrics.render_time * 1000:.1f}',
+            f'total;dur={metrics.duration * 1000:.1f}',
+        ))
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'view': view,
+            'status': response.status_code,
+            'duration_ms': round(metrics.duration * 1000, 1),
+            'db_ms': round(metrics.db_time * 1000, 1),
+            'queries': metrics.queries,
+            'duplicate_queries': metrics.duplicates,
+            'duplicates': [
+                {'count': count, 'sql': sql[:200]}
+                for sql, count in metrics.fingerprints.most_common(3)
+                if count > 1
+            ],
+            'serializer_ms': round(metrics.serializer_time * 1000, 1),
+            'render_ms': round(metrics.render_time * 1000, 1),
+            'response_bytes': metrics.size,
+        }, ensure_ascii=False))
+
+
+def metrics_view(request):
+    """Гистограммы запросов всех воркеров в формате Prometheus."""
+    if not settings.REQUEST_METRICS:
+        raise Http404
+    return HttpResponse(
+        collect().render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
@@ -0,0 +1,69 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from api.utils.versions import get_model_version
+
+RESPONSE_CACHE_KEY = 'response:{label}:{version}:{path}'
+
+
+class CachedResponseMixin:
+    """Кэширование ответов справочников, которые почти не меняются.
+
+    ETag и Last-Modified строятся из версии данных модели
+    (см. api.utils.versions), на условный запрос отдаётся 304.
+    Готовый JSON хранится в кэше Django до смены версии.
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def cached_response(self, view, request, *args, **kwargs):
+        """Ответ из кэша, 304 или результат view с заголовками версии."""
+        if request.accepted_renderer.format != 'json':
+            return view(request, *args, **kwargs)
+        model = self.queryset.model
+        version = get_model_version(model)
+        etag = quote_etag(f'{model._meta.model_name}-{version}')
+        last_modified = version // 10 ** 9
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            key = RESPONSE_CACHE_KEY.format(
+                label=model._meta.label_lower,
+                version=version,
+                path=hashlib.md5(
+                    request.get_full_path().encode()
+                ).hexdigest()
+            )
+            cached = cache.get(key)
+            if cached is not None:
+                content, content_type = cached
+                response = HttpResponse(content, content_type=content_type)
+            else:
+                response = view(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+                response.accepted_renderer = request.accepted_renderer
+                response.accepted_media_type = request.accepted_media_type
+                response.renderer_context = self.get_renderer_context()
+                response.render()
+                cache.set(
+                    key,
+                    (response.content, response['Content-Type']),
+                    settings.API_RESPONSE_CACHE_TIMEOUT
+                )
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(response, no_cache=True)
+        return response
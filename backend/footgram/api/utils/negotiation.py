@@ -0,0 +1,12 @@
+from rest_framework.negotiation import DefaultContentNegotiation
+
+
+class FileFormatNegotiation(DefaultContentNegotiation):
+    """Согласование контента для выгрузки файлов.
+
+    Параметр format выбирает формат файла, а не рендерер DRF,
+    поэтому ошибки всегда отдаются первым рендерером (JSON).
+    """
+    def select_renderer(self, request, renderers, format_suffix=None):
+        renderer = renderers[0]
+        return renderer, renderer.media_type
@@ -1,7 +1,182 @@
+import base64
+import json
+import re
+from collections import OrderedDict
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+COUNT_EXACT = 'exact'
+COUNT_ESTIMATE = 'estimate'
+COUNT_NONE = 'none'
+
+
+def estimate_count(queryset):
+    """Оценка числа строк по плану запроса PostgreSQL.
+
+    Для других СУБД выполняется обычный COUNT(*).
+    """
+    if connections[queryset.db].vendor != 'postgresql':
+        return queryset.count()
+    match = re.search(r'rows=(\d+)', queryset.order_by().explain())
+    if match is None:
+        return queryset.count()
+    return int(match[1])
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор Django с приблизительным числом объектов."""
+
+    @cached_property
+    def count(self):
+        return estimate_count(self.object_list)
 
 
 class PageLimitPaginator(PageNumberPagination):
-    """Пагинация по страницам."""
+    """Пагинация по страницам.
+
+    Если у вьюсета задан keyset_field и в запросе есть параметр cursor,
+    выдача идёт по курсору (keyset): следующая страница выбирается
+    условием (keyset_field, id) < (значения последнего объекта),
+    без OFFSET, поэтому глубокие страницы не дороже первой. Курсор
+    несовместим с другой сортировкой (ordering, search, match).
+    Параметр count задаёт подсчёт общего числа объектов:
+    exact (COUNT(*)), estimate (оценка планировщика) или none.
+    """
     page_size = 5
     page_size_query_param = 'limit'
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.keyset_field = getattr(view, 'keyset_field', None)
+        self.count_mode = request.query_params.get(self.count_query_param)
+        if (
+            self.keyset_field
+            and self.cursor_query_param in request.query_params
+        ):
+            return self.paginate_keyset(queryset, request)
+        self.keyset_field = None
+        if self.count_mode == COUNT_NONE:
+            return self.paginate_without_count(queryset, request)
+        if self.count_mode == COUNT_ESTIMATE:
+            self.django_paginator_class = EstimatedCountPaginator
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset_field is not None:
+            next_link = self.get_next_cursor_link()
+            previous_link = None
+        elif self.count_mode == COUNT_NONE:
+            next_link = self.get_page_link(self.page_number + 1)
+            previous_link = self.get_page_link(self.page_number - 1)
+        else:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('count', self.count),
+            ('next', next_link),
+            ('previous', previous_link),
+            ('results', data)
+        ]))
+
+    def paginate_without_count(self, queryset, request):
+        """Страница по номеру без COUNT(*): выбирается на объект больше."""
+        page_size = self.get_page_size(request)
+        try:
+            self.page_number = int(
+                request.query_params.get(self.page_query_param, 1)
+            )
+        except ValueError:
+            self.page_number = 0
+        if self.page_number < 1:
+            raise NotFound('Неверная страница.')
+        offset = (self.page_number - 1) * page_size
+        objects = list(queryset[offset:offset + page_size + 1])
+        if not objects and self.page_number > 1:
+            raise NotFound('Неверная страница.')
+        self.count = None
+        self.last_page = self.page_number
+        if len(objects) > page_size:
+            self.last_page += 1
+        return objects[:page_size]
+
+    def get_page_link(self, number):
+        if number < 1 or number > self.last_page:
+            return None
+        url = self.request.build_absolute_uri()
+        if number == 1:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.page_query_param, number)
+
+    def paginate_keyset(self, queryset, request):
+        """Страница выдачи по курсору, от новых объектов к старым."""
+        field = self.keyset_field
+        if queryset.query.order_by not in (
+                (), (f'-{field}',), (f'-{field}', '-id')):
+            raise ValidationError({
+                self.cursor_query_param:
+                    'Выдача по курсору возможна только в порядке '
+                    'от новых объектов к старым.'
+            })
+        page_size = self.get_page_size(request)
+        if self.count_mode == COUNT_EXACT:
+            self.count = queryset.count()
+        elif self.count_mode == COUNT_ESTIMATE:
+            self.count = estimate_count(queryset)
+        else:
+            self.count = None
+        queryset = queryset.order_by(f'-{field}', '-id')
+        cursor = self.decode_cursor(
+            request.query_params[self.cursor_query_param]
+        )
+        if cursor is not None:
+            value, pk = cursor
+            queryset = queryset.filter(
+                Q(**{f'{field}__lt': value})
+                | Q(**{field: value, 'id__lt': pk}),
+                **{f'{field}__lte': value}
+            )
+        objects = list(queryset[:page_size + 1])
+        self.next_cursor = None
+        if len(objects) > page_size:
+            objects = objects[:page_size]
+            last = objects[-1]
+            self.next_cursor = self.encode_cursor(
+                getattr(last, field), last.id
+            )
+        return objects
+
+    def encode_cursor(self, value, pk):
+        data = json.dumps((value.isoformat(), pk)).encode()
+        return base64.urlsafe_b64encode(data).decode()
+
+    def decode_cursor(self, cursor):
+        if not cursor:
+            return None
+        try:
+            value, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            value = parse_datetime(value)
+            pk = int(pk)
+        except (TypeError, ValueError):
+            raise NotFound('Неверный курсор.')
+        if value is None:
+            raise NotFound('Неверный курсор.')
+        return value, pk
+
+    def get_next_cursor_link(self):
+        if self.next_cursor is None:
+            return None
+        url = remove_query_param(
+            self.request.build_absolute_uri(), self.page_query_param
+        )
+        return replace_query_param(
+            url, self.cursor_query_param, self.next_cursor
+        )
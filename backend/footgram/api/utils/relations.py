@@ -0,0 +1,43 @@
+from django.utils.functional import cached_property
+
+from recipes.models import FavoriteRecipe, ShoppingList
+from users.models import Follow
+
+
+class UserRelations:
+    """Избранное, корзина и подписки пользователя.
+
+    Каждое множество загружается одним запросом при первом обращении
+    и дальше проверяется без запросов к базе.
+    """
+
+    def __init__(self, user):
+        self.user = user
+
+    def _ids(self, queryset, field):
+        if not self.user.is_authenticated:
+            return frozenset()
+        return frozenset(queryset.filter(
+            user=self.user
+        ).values_list(field, flat=True))
+
+    @cached_property
+    def favorite_ids(self):
+        return self._ids(FavoriteRecipe.objects, 'recipe_id')
+
+    @cached_property
+    def shopping_cart_ids(self):
+        return self._ids(ShoppingList.objects, 'recipe_id')
+
+    @cached_property
+    def following_ids(self):
+        return self._ids(Follow.objects, 'author_id')
+
+
+def get_user_relations(request):
+    """UserRelations текущего пользователя, одни на весь запрос."""
+    relations = getattr(request, '_user_relations', None)
+    if relations is None or relations.user != request.user:
+        relations = UserRelations(request.user)
+        request._user_relations = relations
+    return relations
@@ -0,0 +1,59 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from recipes.models import ModelVersion
+
+VERSION_CACHE_KEY = 'model_version:{label}'
+
+
+def _cache_key(label):
+    return VERSION_CACHE_KEY.format(label=label)
+
+
+def get_version(label, create=True):
+    """Версия данных по метке, общая для всех процессов через базу.
+
+    Версия - время последнего изменения в наносекундах. В кэше
+    процесса она хранится MODEL_VERSION_CACHE_TIMEOUT секунд, поэтому
+    изменение видно всем воркерам не позже чем через это время.
+    Без create отсутствующая версия равна 0 и в базу не пишется.
+    """
+    key = _cache_key(label)
+    version = cache.get(key)
+    if version is None:
+        if create:
+            version = ModelVersion.objects.get_or_create(
+                label=label, defaults={'version': time.time_ns()}
+            )[0].version
+        else:
+            version = ModelVersion.objects.filter(label=label).values_list(
+                'version', flat=True
+            ).first() or 0
+        cache.set(key, version, settings.MODEL_VERSION_CACHE_TIMEOUT)
+    return version
+
+
+def bump_version(label):
+    """Сменить версию данных по метке после изменения.
+
+    Версия процесса сбрасывается после фиксации транзакции, чтобы
+    под новой версией не закэшировались старые данные.
+    """
+    ModelVersion.objects.update_or_create(
+        label=label, defaults={'version': time.time_ns()}
+    )
+    key = _cache_key(label)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def get_model_version(model):
+    """Версия данных модели."""
+    return get_version(model._meta.label_lower)
+
+
+def bump_model_version(model):
+    """Сменить версию данных модели после изменения."""
+    bump_version(model._meta.label_lower)
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -42,6 +43,27 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Замер SQL-запросов, времени и размера ответов (api/utils/instrumentation.py)
+# для доли запросов REQUEST_METRICS_SAMPLE_RATE.
+REQUEST_METRICS = os.getenv(
+    'REQUEST_METRICS', default='False'
+).lower() == 'true'
+
+REQUEST_METRICS_SAMPLE_RATE = float(
+    os.getenv('REQUEST_METRICS_SAMPLE_RATE', 1)
+)
+
+# Общий каталог воркеров gunicorn: /api/metrics суммирует их показатели.
+REQUEST_METRICS_DIR = os.getenv(
+    'REQUEST_METRICS_DIR',
+    os.path.join(tempfile.gettempdir(), 'footgram-metrics')
+)
+
+if REQUEST_METRICS:
+    MIDDLEWARE.insert(
+        0, 'api.utils.instrumentation.RequestMetricsMiddleware'
+    )
+
 ROOT_URLCONF = 'footgram.urls'
 
 TEMPLATES = [
@@ -78,10 +100,46 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER', 'django'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
         'HOST': os.getenv('DB_HOST', ''),
-        'PORT': os.getenv('DB_PORT', 5432)
+        'PORT': os.getenv('DB_PORT', 5432),
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+        # За PgBouncer в режиме transaction серверные курсоры не работают.
+        'DISABLE_SERVER_SIDE_CURSORS': os.getenv(
+            'DB_DISABLE_SERVER_SIDE_CURSORS', default='False'
+        ).lower() == 'true',
     }
 }
 
+# Проверка постоянных соединений перед каждым запросом (api/utils/db.py).
+DB_CONN_HEALTH_CHECKS = os.getenv(
+    'DB_CONN_HEALTH_CHECKS', default='False'
+).lower() == 'true'
+
+# Реплики для чтения (host или host:port через запятую): GET-запросы
+# к рецептам, тегам, ингредиентам и пользователям распределяются между
+# ними по кругу (api/utils/db.py).
+for number, replica in enumerate(
+        filter(None, os.getenv('DB_REPLICA_HOSTS', '').split(',')), 1):
+    host, _, port = replica.strip().partition(':')
+    DATABASES[f'replica_{number}'] = {
+        **DATABASES['default'],
+        'NAME': os.getenv('DB_REPLICA_NAME', DATABASES['default']['NAME']),
+        'HOST': host,
+        'PORT': port or os.getenv(
+            'DB_REPLICA_PORT', DATABASES['default']['PORT']
+        ),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+# Сколько секунд после записи клиент читает только с основной базы.
+DATABASE_REPLICA_STICKY_SECONDS = int(
+    os.getenv('DB_REPLICA_STICKY_SECONDS', 10)
+)
+
+if DATABASE_REPLICAS:
+    DATABASE_ROUTERS = ['api.utils.db.ReplicaRouter']
+    MIDDLEWARE.append('api.utils.db.ReplicaMiddleware')
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -117,9 +175,79 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Кэш Django: по умолчанию в памяти процесса. Для общего кэша воркеров
+# можно указать, например, django.core.cache.backends.filebased.FileBasedCache
+# с каталогом в CACHE_LOCATION или django_redis.cache.RedisCache
+# с адресом redis://... (нужен пакет django-redis).
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    },
+    # Токены авторизации (api/utils/authentication.py). Выход и изменение
+    # пользователя видны другим воркерам через MODEL_VERSION_CACHE_TIMEOUT.
+    'tokens': {
+        'BACKEND': os.getenv(
+            'TOKEN_CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('TOKEN_CACHE_LOCATION', 'tokens'),
+        'TIMEOUT': int(os.getenv('TOKEN_CACHE_TIMEOUT', 60)),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('TOKEN_CACHE_MAX_ENTRIES', 10000)),
+        },
+    },
+}
+
+TOKEN_CACHE = 'tokens'
+
+API_RESPONSE_CACHE_TIMEOUT = int(
+    os.getenv('API_RESPONSE_CACHE_TIMEOUT', 60 * 60 * 24)
+)
+
+# Сколько секунд процесс использует версию справочника (api/utils/versions.py)
+# без обращения к базе.
+MODEL_VERSION_CACHE_TIMEOUT = int(os.getenv('MODEL_VERSION_CACHE_TIMEOUT', 5))
+
+INGREDIENT_CATALOG_IN_MEMORY = os.getenv(
+    'INGREDIENT_CATALOG_IN_MEMORY', default='False'
+).lower() == 'true'
+
+RECIPE_IMAGE_MAX_SIZE = int(
+    os.getenv('RECIPE_IMAGE_MAX_SIZE', 10 * 1024 * 1024)
+)
+
+RECIPE_IMAGE_MAX_PIXELS = int(os.getenv('RECIPE_IMAGE_MAX_PIXELS', 40_000_000))
+
+IMAGE_VARIANT_WORKERS = int(os.getenv('IMAGE_VARIANT_WORKERS', 2))
+
+SHOPPING_CART_PDF_FONT = os.getenv(
+    'SHOPPING_CART_PDF_FONT',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
+SHOPPING_CART_PDF_ASYNC_THRESHOLD = int(
+    os.getenv('SHOPPING_CART_PDF_ASYNC_THRESHOLD', 100)
+)
+
+SHOPPING_CART_PDF_WORKERS = int(os.getenv('SHOPPING_CART_PDF_WORKERS', 2))
+
+# Каталог PDF, созданных в фоне, вне MEDIA_ROOT. Общий для всех воркеров.
+SHOPPING_CART_PDF_ROOT = os.getenv(
+    'SHOPPING_CART_PDF_ROOT', os.path.join(BASE_DIR, 'shopping_lists')
+)
+
+# Асинхронные view чтения (api/utils/asynchronous.py), включаются
+# в footgram/asgi.py. Запросы к базе выполняются в пуле потоков.
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', default='False').lower() == 'true'
+
+ASYNC_VIEW_WORKERS = int(os.getenv('ASYNC_VIEW_WORKERS', 16))
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'api.utils.authentication.CachedTokenAuthentication',
     )
 }
 
@@ -136,3 +264,20 @@ DJOSER = {
         'user_list': ('rest_framework.permissions.IsAuthenticatedOrReadOnly',)
     }
 }
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'api.utils.instrumentation': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
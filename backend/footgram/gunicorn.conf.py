@@ -0,0 +1,95 @@
+"""Настройки gunicorn, значения берутся из переменных окружения.
+
+GUNICORN_WORKER_CLASS: gthread (по умолчанию), sync или uvicorn -
+асинхронный режим footgram.asgi (см. ASYNC_VIEWS в настройках).
+"""
+import multiprocessing
+import os
+import time
+
+WORKER_CLASSES = {
+    'sync': 'sync',
+    'gthread': 'gthread',
+    'uvicorn': 'uvicorn.workers.UvicornWorker',
+}
+
+cpu_count = multiprocessing.cpu_count()
+worker_class = WORKER_CLASSES[os.getenv('GUNICORN_WORKER_CLASS', 'gthread')]
+wsgi_app = (
+    'footgram.asgi:application' if worker_class.startswith('uvicorn')
+    else 'footgram.wsgi:application'
+)
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.getenv(
+    'GUNICORN_WORKERS',
+    cpu_count * 2 + 1 if worker_class == 'sync' else cpu_count + 1
+))
+threads = int(os.getenv(
+    'GUNICORN_THREADS', 4 if worker_class == 'gthread' else 1
+))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+
+# Перезапуск воркера после max_requests запросов ограничивает рост памяти,
+# jitter разносит перезапуски воркеров во времени.
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+# Django, DRF и каталог ингредиентов загружаются в мастер-процессе
+# один раз и разделяются воркерами после fork (copy-on-write).
+preload_app = os.getenv('GUNICORN_PRELOAD', 'True').lower() == 'true'
+
+# Файл heartbeat воркеров в памяти, а не на диске контейнера.
+worker_tmp_dir = os.getenv('GUNICORN_WORKER_TMP_DIR', '/dev/shm')
+
+slow_request_ms = int(os.getenv('GUNICORN_SLOW_REQUEST_MS', 1000))
+
+
+def when_ready(server):
+    """Прогрев каталога ингредиентов до запуска воркеров.
+
+    Если база ещё недоступна (нет миграций), каталог загрузится
+    в воркерах при первом запросе. Соединения с базой и кэшем
+    закрываются, чтобы воркеры не делили сокеты мастер-процесса.
+    """
+    if not preload_app:
+        return
+    from django.conf import settings
+    from django.core.cache import close_caches
+    from django.db import DatabaseError, connections
+
+    if settings.INGREDIENT_CATALOG_IN_MEMORY:
+        from api.ingredients.catalog import get_catalog
+        try:
+            catalog = get_catalog()
+        except DatabaseError as error:
+            server.log.warning(
+                'Каталог ингредиентов не загружен: %s', error
+            )
+        else:
+            server.log.info(
+                'Каталог ингредиентов загружен: %s записей',
+                len(catalog.items)
+            )
+    connections.close_all()
+    close_caches()
+
+
+def pre_request(worker, req):
+    req.started = time.monotonic()
+
+
+def post_request(worker, req, environ, resp):
+    """Запросы дольше GUNICORN_SLOW_REQUEST_MS попадают в журнал.
+
+    Вызывается воркерами sync и gthread, для uvicorn время запросов
+    пишет RequestMetricsMiddleware.
+    """
+    duration = (time.monotonic() - req.started) * 1000
+    if duration >= slow_request_ms:
+        worker.log.warning(
+            'Медленный запрос %s %s: %.0f мс, статус %s',
+            req.method, req.path, duration, resp.status
+        )
@@ -58,9 +58,12 @@ class RecipeAdmin(admin.ModelAdmin):
     filter_horizontal = ('tags',)
     empty_value_display = '-пусто-'
 
-    @admin.display(description='Добавлений в избранное')
+    @admin.display(
+        description='Добавлений в избранное',
+        ordering='favorites_count'
+    )
     def in_favorites(self, instance):
-        return instance.favorite.count()
+        return instance.favorites_count
 
 
 @admin.register(ShoppingList)
@@ -0,0 +1,52 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import FavoriteRecipe, Recipe
+from users.models import Follow
+
+User = get_user_model()
+
+
+def change_counter(model, pk, field, delta):
+    """Атомарно изменить счётчик через F(), не уходя ниже нуля."""
+    queryset = model.objects.filter(pk=pk)
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def _count_subquery(model, field):
+    """Подзапрос числа строк model, ссылающихся на внешнюю запись."""
+    return Coalesce(
+        Subquery(
+            model.objects.filter(
+                **{field: OuterRef('pk')}
+            ).order_by().values(field).annotate(
+                total=Count('pk')
+            ).values('total'),
+            output_field=IntegerField()
+        ),
+        0
+    )
+
+
+def recount():
+    """Пересчитать все счётчики по фактическим данным.
+
+    Возвращает число исправленных записей для каждого счётчика.
+    """
+    counters = (
+        (Recipe, 'favorites_count', FavoriteRecipe, 'recipe'),
+        (User, 'recipes_count', Recipe, 'author'),
+        (User, 'followers_count', Follow, 'author'),
+    )
+    fixed = {}
+    for model, field, related_model, related_field in counters:
+        actual = _count_subquery(related_model, related_field)
+        fixed[f'{model._meta.model_name}.{field}'] = model.objects.annotate(
+            actual=actual
+        ).exclude(
+            **{field: F('actual')}
+        ).update(**{field: actual})
+    return fixed
@@ -0,0 +1,82 @@
+import logging
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from PIL import Image, ImageOps
+
+from recipes.models import Recipe
+
+logger = logging.getLogger(__name__)
+
+# Название варианта: (наибольший размер, формат PIL, расширение файла).
+IMAGE_VARIANTS = {
+    'thumbnail': ((320, 320), 'JPEG', 'jpg'),
+    'webp': ((1280, 1280), 'WEBP', 'webp'),
+}
+
+
+def variant_name(name, variant):
+    """Имя файла варианта рядом с оригиналом: recipes/<имя>_<вариант>.<ext>."""
+    _, _, extension = IMAGE_VARIANTS[variant]
+    root, _ = posixpath.splitext(name)
+    return f'{root}_{variant}.{extension}'
+
+
+def variant_url(name, variant):
+    """Адрес варианта в хранилище, без проверки его наличия."""
+    return default_storage.url(variant_name(name, variant))
+
+
+def make_variants(name):
+    """Создать уменьшенные варианты изображения name в хранилище.
+
+    Готовность отмечается в Recipe.image_variants_source, чтобы
+    сериализаторы не проверяли наличие файлов в хранилище.
+    """
+    with default_storage.open(name, 'rb') as file, Image.open(file) as image:
+        largest = max(size for size, _, _ in IMAGE_VARIANTS.values())
+        image.draft('RGB', largest)
+        image = ImageOps.exif_transpose(image)
+        for variant, (size, image_format, _) in IMAGE_VARIANTS.items():
+            resized = image.copy()
+            resized.thumbnail(size, Image.LANCZOS)
+            if image_format == 'JPEG' and resized.mode != 'RGB':
+                resized = resized.convert('RGB')
+            buffer = BytesIO()
+            resized.save(buffer, image_format, quality=85, optimize=True)
+            path = variant_name(name, variant)
+            if default_storage.exists(path):
+                default_storage.delete(path)
+            default_storage.save(path, ContentFile(buffer.getvalue()))
+    Recipe.objects.filter(image=name).update(image_variants_source=name)
+
+
+@lru_cache(maxsize=None)
+def get_executor():
+    """Пул потоков для обработки изображений вне запроса."""
+    return ThreadPoolExecutor(
+        max_workers=settings.IMAGE_VARIANT_WORKERS,
+        thread_name_prefix='recipe-images'
+    )
+
+
+def _make_variants_safely(name):
+    try:
+        make_variants(name)
+    except Exception:
+        logger.exception('Не удалось обработать изображение %s', name)
+    finally:
+        # Поток пула не проходит через обработчик запроса, и соединение,
+        # открытое для записи image_variants_source, закрывается здесь.
+        connection.close()
+
+
+def schedule_variants(name):
+    """Поставить создание вариантов изображения в очередь пула."""
+    return get_executor().submit(_make_variants_safely, name)
@@ -0,0 +1,115 @@
+import csv
+import json
+from itertools import islice
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.utils.versions import bump_model_version
+from recipes.models import Ingredient
+
+DEFAULT_PATH = Path(settings.BASE_DIR) / 'data' / 'ingredients.csv'
+DEFAULT_BATCH_SIZE = 1000
+READ_CHUNK_SIZE = 64 * 1024
+
+
+def read_csv(path):
+    """Построчное чтение ингредиентов из CSV: название, единица измерения."""
+    with open(path, encoding='utf-8', newline='') as file:
+        for row in csv.reader(file):
+            if len(row) >= 2:
+                yield row[0], row[1]
+
+
+def read_json(path):
+    """Потоковое чтение ингредиентов из JSON-массива.
+
+    Поддерживается как фикстура Django, так и список объектов
+    с полями name и measurement_unit. Файл читается кусками,
+    поэтому в памяти никогда не лежит весь массив.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    started = False
+    with open(path, encoding='utf-8') as file:
+        while True:
+            chunk = file.read(READ_CHUNK_SIZE)
+            buffer += chunk
+            while True:
+                buffer = buffer.lstrip(' \t\r\n,')
+                if not started:
+                    if not buffer:
+                        break
+                    if buffer[0] != '[':
+                        raise CommandError('Ожидается JSON-массив.')
+                    buffer = buffer[1:]
+                    started = True
+                    continue
+                if not buffer or buffer[0] == ']':
+                    break
+                try:
+                    item, end = decoder.raw_decode(buffer)
+                except json.JSONDecodeError:
+                    if not chunk:
+                        raise CommandError('Некорректный JSON.')
+                    break
+                buffer = buffer[end:]
+                fields = item.get('fields', item)
+                yield fields['name'], fields['measurement_unit']
+            if not chunk:
+                return
+
+
+READERS = {
+    '.csv': read_csv,
+    '.json': read_json,
+}
+
+
+class Command(BaseCommand):
+    help = 'Загрузка ингредиентов из CSV или JSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            nargs='?',
+            default=str(DEFAULT_PATH),
+            help='Путь к файлу .csv или .json.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help='Количество ингредиентов в одном INSERT.'
+        )
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size должен быть больше 0.')
+        reader = READERS.get(path.suffix.lower())
+        if reader is None:
+            raise CommandError('Поддерживаются только файлы .csv и .json.')
+        if not path.exists():
+            raise CommandError(f'Файл {path} не найден.')
+        count_before = Ingredient.objects.count()
+        rows = reader(path)
+        processed = 0
+        while True:
+            batch = [
+                Ingredient(name=name.strip(), measurement_unit=unit.strip())
+                for name, unit in islice(rows, batch_size)
+            ]
+            if not batch:
+                break
+            Ingredient.objects.bulk_create(batch, ignore_conflicts=True)
+            processed += len(batch)
+            self.stdout.write(f'Обработано ингредиентов: {processed}')
+        created = Ingredient.objects.count() - count_before
+        if created:
+            bump_model_version(Ingredient)
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово. Прочитано: {processed}, добавлено: {created}.'
+        ))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.counters import recount
+
+
+class Command(BaseCommand):
+    help = 'Пересчёт счётчиков избранного, рецептов и подписчиков.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            fixed = recount()
+        for counter, count in fixed.items():
+            self.stdout.write(f'{counter}: исправлено записей {count}')
+        self.stdout.write(self.style.SUCCESS('Готово.'))
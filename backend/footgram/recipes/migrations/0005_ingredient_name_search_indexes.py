@@ -0,0 +1,50 @@
+from django.db import migrations
+
+PREFIX_INDEX = (
+    'CREATE INDEX IF NOT EXISTS recipes_ingredient_name_upper_prefix '
+    'ON recipes_ingredient (UPPER("name"::text) text_pattern_ops)'
+)
+TRIGRAM_INDEX = (
+    'CREATE INDEX IF NOT EXISTS recipes_ingredient_name_upper_trgm '
+    'ON recipes_ingredient USING gin (UPPER("name"::text) gin_trgm_ops)'
+)
+
+
+def create_indexes(apps, schema_editor):
+    """Индексы поиска по названию, только для PostgreSQL.
+
+    Триграммный индекс создаётся, если доступно расширение pg_trgm.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(PREFIX_INDEX)
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'"
+        )
+        has_trigram = cursor.fetchone() is not None
+    if has_trigram:
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        schema_editor.execute(TRIGRAM_INDEX)
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'DROP INDEX IF EXISTS recipes_ingredient_name_upper_trgm'
+    )
+    schema_editor.execute(
+        'DROP INDEX IF EXISTS recipes_ingredient_name_upper_prefix'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_alter_amountingredient_ingredient'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -0,0 +1,43 @@
+from django.db import migrations
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_subquery(model, field):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(
+                **{field: OuterRef('pk')}
+            ).order_by().values(field).annotate(
+                total=Count('pk')
+            ).values('total'),
+            output_field=IntegerField()
+        ),
+        0
+    )
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    FavoriteRecipe = apps.get_model('recipes', 'FavoriteRecipe')
+    CustomUser = apps.get_model('users', 'CustomUser')
+    Follow = apps.get_model('users', 'Follow')
+    Recipe.objects.update(
+        favorites_count=count_subquery(FavoriteRecipe, 'recipe')
+    )
+    CustomUser.objects.update(
+        recipes_count=count_subquery(Recipe, 'author'),
+        followers_count=count_subquery(Follow, 'author')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipe_favorites_count'),
+        ('users', '0004_customuser_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
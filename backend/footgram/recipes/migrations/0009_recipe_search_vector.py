@@ -0,0 +1,62 @@
+import django.contrib.postgres.search
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+SEARCH_CONFIG = 'russian'
+SEARCH_INDEX = (
+    'CREATE INDEX IF NOT EXISTS recipes_recipe_search_vector_gin '
+    'ON recipes_recipe USING gin (search_vector)'
+)
+
+
+def fill_search_vector(apps, schema_editor):
+    """GIN-индекс и заполнение вектора, только для PostgreSQL."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    Recipe = apps.get_model('recipes', 'Recipe')
+    AmountIngredient = apps.get_model('recipes', 'AmountIngredient')
+    ingredient_names = Subquery(
+        AmountIngredient.objects.filter(
+            recipe=OuterRef('pk')
+        ).order_by().values('recipe').annotate(
+            names=StringAgg('ingredient__name', ' ')
+        ).values('names')
+    )
+    Recipe.objects.update(search_vector=(
+        SearchVector('name', weight='A', config=SEARCH_CONFIG)
+        + SearchVector(
+            Coalesce(
+                ingredient_names, Value(''), output_field=models.TextField()
+            ),
+            weight='B', config=SEARCH_CONFIG
+        )
+        + SearchVector('text', weight='C', config=SEARCH_CONFIG)
+    ))
+    schema_editor.execute(SEARCH_INDEX)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'DROP INDEX IF EXISTS recipes_recipe_search_vector_gin'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_fill_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunPython(fill_search_vector, drop_search_index),
+    ]
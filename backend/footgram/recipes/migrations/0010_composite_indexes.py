@@ -0,0 +1,53 @@
+# Generated by Django 3.2.4 on 2026-10-18 19:51
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0009_recipe_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='amountingredient',
+            index=models.Index(fields=['recipe', 'ingredient'], include=('amount',), name='amount_recipe_ingredient_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='favoriterecipe',
+            index=models.Index(fields=['recipe', 'user'], name='favorite_recipe_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-pub_date', '-id'], name='recipe_author_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shoppinglist',
+            index=models.Index(fields=['recipe', 'user'], name='shopping_recipe_user_idx'),
+        ),
+        # Одиночные индексы внешних ключей повторяют начало составных.
+        migrations.AlterField(
+            model_name='amountingredient',
+            name='recipe',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='recipes.recipe', verbose_name='Рецепт'),
+        ),
+        migrations.AlterField(
+            model_name='favoriterecipe',
+            name='recipe',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='favorite', to='recipes.recipe', verbose_name='Рецепт'),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='author',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='recipes', to=settings.AUTH_USER_MODEL, verbose_name='Автор'),
+        ),
+        migrations.AlterField(
+            model_name='shoppinglist',
+            name='recipe',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='shopping_list', to='recipes.recipe', verbose_name='Рецепт'),
+        ),
+    ]
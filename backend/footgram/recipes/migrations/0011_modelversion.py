@@ -0,0 +1,24 @@
+# Generated by Django 3.2.4 on 2026-10-18 20:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ModelVersion',
+            fields=[
+                ('label', models.CharField(max_length=100, primary_key=True, serialize=False, verbose_name='Модель')),
+                ('version', models.BigIntegerField(verbose_name='Версия')),
+            ],
+            options={
+                'verbose_name': 'Версия данных',
+                'verbose_name_plural': 'Версии данных',
+            },
+        ),
+    ]
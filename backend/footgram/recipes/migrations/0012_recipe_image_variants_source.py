@@ -0,0 +1,47 @@
+# Generated by Django 3.2.4 on 2026-10-18 20:17
+
+import posixpath
+
+from django.core.files.storage import default_storage
+from django.db import migrations, models
+
+# Варианты на момент миграции: название и расширение файла
+# (recipes/images.py может измениться, миграция - нет).
+VARIANT_EXTENSIONS = {'thumbnail': 'jpg', 'webp': 'webp'}
+
+
+def variant_name(name, variant):
+    root, _ = posixpath.splitext(name)
+    return f'{root}_{variant}.{VARIANT_EXTENSIONS[variant]}'
+
+
+def fill_image_variants_source(apps, schema_editor):
+    """Отметить рецепты, варианты изображений которых уже созданы."""
+    Recipe = apps.get_model('recipes', 'Recipe')
+    names = Recipe.objects.exclude(image='').values_list('image', flat=True)
+    for name in names.distinct().iterator():
+        if all(
+            default_storage.exists(variant_name(name, variant))
+            for variant in VARIANT_EXTENSIONS
+        ):
+            Recipe.objects.filter(image=name).update(
+                image_variants_source=name
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_modelversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_variants_source',
+            field=models.CharField(blank=True, editable=False, max_length=100, verbose_name='Изображение с готовыми вариантами'),
+        ),
+        migrations.RunPython(
+            fill_image_variants_source, migrations.RunPython.noop
+        ),
+    ]
@@ -1,13 +1,22 @@
 from colorfield.fields import ColorField
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import connections, models, transaction
+from django.db.models import (
+    Count, Exists, F, OuterRef, Prefetch, Q, Subquery, Value, Window
+)
+from django.db.models.functions import Cast, Coalesce, RowNumber
+
+from users.models import CountersModel, Follow
 
 User = get_user_model()
 NAME_LENGTH = 200
 TAG_INGREDIENT_LENGTH = 50
 MIN_VALUE_VALIDATOR = 1
 MAX_VALUE_VALIDATOR = 32767
+SEARCH_CONFIG = 'russian'
 
 
 class Ingredient(models.Model):
@@ -62,13 +71,131 @@ class Tag(models.Model):
         return self.name
 
 
-class Recipe(models.Model):
+class RecipeQuerySet(models.QuerySet):
+    """Набор запросов Рецептов."""
+
+    def with_related(self):
+        """Автор, теги и ингредиенты за фиксированное число запросов.
+
+        Поисковый вектор нужен только в WHERE и не читается.
+        """
+        return self.defer('search_vector').select_related(
+            'author'
+        ).prefetch_related(
+            'tags',
+            Prefetch(
+                'amountingredient_set',
+                queryset=AmountIngredient.objects.select_related('ingredient')
+            )
+        )
+
+    def with_user_annotations(self, user):
+        """Флаги избранного, корзины и подписки на автора для user."""
+        if not user.is_authenticated:
+            return self.annotate(
+                is_favorited=Value(False, output_field=models.BooleanField()),
+                is_in_shopping_cart=Value(
+                    False, output_field=models.BooleanField()
+                ),
+                author_is_subscribed=Value(
+                    False, output_field=models.BooleanField()
+                )
+            )
+        return self.annotate(
+            is_favorited=Exists(FavoriteRecipe.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+            is_in_shopping_cart=Exists(ShoppingList.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+            author_is_subscribed=Exists(Follow.objects.filter(
+                user=user, author=OuterRef('author')
+            ))
+        )
+
+    def latest_for_authors(self, authors, limit=None):
+        """Последние limit рецептов каждого из авторов одним запросом.
+
+        Нумерация рецептов автора считается оконной функцией
+        ROW_NUMBER() OVER (PARTITION BY author_id ORDER BY pub_date DESC).
+        """
+        if not authors:
+            # Пустой IN не компилируется в SQL (EmptyResultSet).
+            return self.none()
+        queryset = self.filter(author__in=authors).defer('search_vector')
+        if limit is None:
+            return queryset
+        queryset = queryset.annotate(
+            row_number=Window(
+                expression=RowNumber(),
+                partition_by=[F('author_id')],
+                order_by=[F('pub_date').desc(), F('id').desc()]
+            )
+        )
+        sql, params = queryset.query.sql_with_params()
+        return self.model.objects.raw(
+            f'SELECT * FROM ({sql}) AS ranked '
+            'WHERE ranked.row_number <= %s '
+            'ORDER BY ranked.author_id, ranked.row_number',
+            (*params, limit)
+        )
+
+    def with_coverage(self, ingredient_ids):
+        """Рецепты, в которых есть хотя бы один из ingredient_ids.
+
+        Кандидаты берутся по индексу ingredient_id, число совпавших и
+        всех ингредиентов считается одним сгруппированным запросом
+        по AmountIngredient, coverage - их доля.
+        """
+        return self.filter(pk__in=AmountIngredient.objects.filter(
+            ingredient__in=ingredient_ids
+        ).values('recipe')).annotate(
+            ingredients_total=Count('amountingredient'),
+            ingredients_matched=Count(
+                'amountingredient',
+                filter=Q(amountingredient__ingredient__in=ingredient_ids)
+            )
+        ).annotate(
+            coverage=Cast(
+                F('ingredients_matched'), models.FloatField()
+            ) / Cast(F('ingredients_total'), models.FloatField())
+        ).order_by('-coverage', '-ingredients_matched', '-pub_date', '-id')
+
+    def update_search_vector(self):
+        """Пересчитать поисковый вектор рецептов, только для PostgreSQL.
+
+        Название весит больше ингредиентов, ингредиенты больше текста.
+        """
+        if connections[self.db].vendor != 'postgresql':
+            return 0
+        ingredient_names = Subquery(
+            AmountIngredient.objects.filter(
+                recipe=OuterRef('pk')
+            ).order_by().values('recipe').annotate(
+                names=StringAgg('ingredient__name', ' ')
+            ).values('names')
+        )
+        return self.update(search_vector=(
+            SearchVector('name', weight='A', config=SEARCH_CONFIG)
+            + SearchVector(
+                Coalesce(
+                    ingredient_names, Value(''),
+                    output_field=models.TextField()
+                ),
+                weight='B', config=SEARCH_CONFIG
+            )
+            + SearchVector('text', weight='C', config=SEARCH_CONFIG)
+        ))
+
+
+class Recipe(CountersModel):
     """Модель Рецепты."""
     author = models.ForeignKey(
         User,
         verbose_name='Автор',
         on_delete=models.CASCADE,
         related_name='recipes',
+        db_index=False
     )
     name = models.CharField(
         verbose_name='Название',
@@ -78,6 +205,12 @@ class Recipe(models.Model):
         verbose_name='Изображение',
         upload_to='recipes/',
     )
+    image_variants_source = models.CharField(
+        verbose_name='Изображение с готовыми вариантами',
+        max_length=100,
+        blank=True,
+        editable=False
+    )
     text = models.TextField(
         verbose_name='Рецепт',
     )
@@ -103,15 +236,56 @@ class Recipe(models.Model):
         verbose_name='Дата создания',
         auto_now_add=True
     )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='Добавлений в избранное',
+        default=0,
+        editable=False
+    )
+    search_vector = SearchVectorField(
+        verbose_name='Поисковый вектор',
+        null=True,
+        editable=False
+    )
+
+    COUNTER_FIELDS = ('favorites_count',)
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Рецепт"
         verbose_name_plural = "Рецепты"
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='recipe_pub_date_id_idx'
+            ),
+            models.Index(
+                fields=['-favorites_count', '-pub_date'],
+                name='recipe_favorites_count_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='recipe_author_pub_date_idx'
+            )
+        ]
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        recipe = super().from_db(db, field_names, values)
+        # Загруженное изображение: варианты создаются только для нового
+        # (recipes/signals.py).
+        recipe.loaded_image = recipe.__dict__.get('image')
+        return recipe
+
+    def save(self, *args, **kwargs):
+        """Счётчики (recipes/signals.py) меняются в той же транзакции."""
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
 
 class AmountIngredient(models.Model):
     """Модель Количество ингридеентов в рецепте."""
@@ -132,6 +306,7 @@ class AmountIngredient(models.Model):
         Recipe,
         verbose_name='Рецепт',
         on_delete=models.CASCADE,
+        db_index=False
     )
 
     class Meta:
@@ -144,6 +319,13 @@ class AmountIngredient(models.Model):
                 name='unique_ingredient'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['recipe', 'ingredient'],
+                include=['amount'],
+                name='amount_recipe_ingredient_idx'
+            )
+        ]
 
     def __str__(self):
         return self.ingredient.name
@@ -161,7 +343,8 @@ class FavoriteRecipe(models.Model):
         Recipe,
         on_delete=models.CASCADE,
         related_name='favorite',
-        verbose_name='Рецепт'
+        verbose_name='Рецепт',
+        db_index=False
     )
 
     class Meta:
@@ -174,10 +357,21 @@ class FavoriteRecipe(models.Model):
                 name='unique_favorite_model'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['recipe', 'user'],
+                name='favorite_recipe_user_idx'
+            )
+        ]
 
     def __str__(self):
         return f'{self.recipe} в избранном у {self.user}'
 
+    def save(self, *args, **kwargs):
+        """Счётчики (recipes/signals.py) меняются в той же транзакции."""
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
 
 class ShoppingList(models.Model):
     """Модель Корзина покупок."""
@@ -191,7 +385,8 @@ class ShoppingList(models.Model):
         Recipe,
         on_delete=models.CASCADE,
         related_name='shopping_list',
-        verbose_name='Рецепт'
+        verbose_name='Рецепт',
+        db_index=False
     )
 
     class Meta:
@@ -204,6 +399,35 @@ class ShoppingList(models.Model):
                 name='unique_shopping_list_model'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['recipe', 'user'],
+                name='shopping_recipe_user_idx'
+            )
+        ]
 
     def __str__(self):
         return f'{self.recipe} в корзине у {self.user}'
+
+
+class ModelVersion(models.Model):
+    """Версия данных модели для ETag и кэша справочников.
+
+    Хранится в базе, чтобы все воркеры видели одну и ту же версию.
+    Метки вида auth_token:... - версии отозванных токенов.
+    """
+    label = models.CharField(
+        verbose_name='Модель',
+        max_length=100,
+        primary_key=True
+    )
+    version = models.BigIntegerField(
+        verbose_name='Версия'
+    )
+
+    class Meta:
+        verbose_name = "Версия данных"
+        verbose_name_plural = "Версии данных"
+
+    def __str__(self):
+        return f'{self.label}: {self.version}'
@@ -0,0 +1,108 @@
+from threading import local
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from recipes.counters import change_counter
+from recipes.images import schedule_variants
+from recipes.models import (
+    AmountIngredient, FavoriteRecipe, Ingredient, Recipe, User
+)
+from users.models import Follow
+
+COUNTERS = {
+    FavoriteRecipe: (Recipe, 'recipe_id', 'favorites_count'),
+    Recipe: (User, 'author_id', 'recipes_count'),
+    Follow: (User, 'author_id', 'followers_count'),
+}
+
+
+class _PendingSearchVectors(local):
+    """Рецепты потока, вектор которых ждёт фиксации транзакции."""
+
+    def __init__(self):
+        self.pks = set()
+
+
+_pending_search_vectors = _PendingSearchVectors()
+
+
+@receiver(post_save, sender=FavoriteRecipe)
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Follow)
+def increment_counter(sender, instance, created, **kwargs):
+    """Увеличить счётчик при создании записи."""
+    if created:
+        model, field, counter = COUNTERS[sender]
+        change_counter(model, getattr(instance, field), counter, 1)
+
+
+@receiver(post_delete, sender=FavoriteRecipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Follow)
+def decrement_counter(sender, instance, **kwargs):
+    """Уменьшить счётчик при удалении записи."""
+    model, field, counter = COUNTERS[sender]
+    change_counter(model, getattr(instance, field), counter, -1)
+
+
+@receiver(post_save, sender=Recipe)
+def make_image_variants(sender, instance, update_fields, **kwargs):
+    """Уменьшенные копии нового изображения создаются в фоне.
+
+    Повторное сохранение рецепта с тем же изображением не ставит
+    задачу в очередь, даже если прежняя ещё не выполнена.
+    """
+    if ('image' in instance.get_deferred_fields()
+            or update_fields is not None and 'image' not in update_fields):
+        return
+    name = instance.image.name
+    if (not name or name == getattr(instance, 'loaded_image', None)
+            or name == instance.image_variants_source):
+        return
+    instance.loaded_image = name
+    transaction.on_commit(lambda: schedule_variants(name))
+
+
+def _update_pending_search_vectors():
+    """Пересчитать векторы рецептов, изменённых в транзакции.
+
+    Первый вызов после фиксации забирает все рецепты, остальные
+    ничего не делают.
+    """
+    pks, _pending_search_vectors.pks = _pending_search_vectors.pks, set()
+    if pks:
+        Recipe.objects.filter(pk__in=pks).update_search_vector()
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=AmountIngredient)
+@receiver(post_delete, sender=AmountIngredient)
+def update_search_vector(sender, instance, **kwargs):
+    """Поисковый вектор пересчитывается после записи ингредиентов."""
+    pk = instance.pk if sender is Recipe else instance.recipe_id
+    _pending_search_vectors.pks.add(pk)
+    transaction.on_commit(_update_pending_search_vectors)
+
+
+@receiver(post_delete, sender=Recipe)
+def skip_search_vector(sender, instance, **kwargs):
+    """Вектор удалённого рецепта не пересчитывается.
+
+    Ингредиенты удаляются каскадом раньше рецепта и успевают
+    поставить его в очередь.
+    """
+    _pending_search_vectors.pks.discard(instance.pk)
+
+
+@receiver(post_save, sender=Ingredient)
+def update_ingredient_search_vectors(sender, instance, created, **kwargs):
+    """Переименование ингредиента меняет вектор рецептов с ним."""
+    if not created:
+        pk = instance.pk
+        transaction.on_commit(
+            lambda: Recipe.objects.filter(
+                ingredients=pk
+            ).update_search_vector()
+        )
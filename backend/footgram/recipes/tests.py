@@ -0,0 +1,235 @@
+from unittest import mock, skipUnless
+
+from django.contrib.postgres.search import SearchQuery
+from django.db import connection, transaction
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from recipes.counters import recount
+from recipes.models import (
+    SEARCH_CONFIG, AmountIngredient, FavoriteRecipe, Ingredient, Recipe,
+    ShoppingList, User
+)
+from users.models import Follow
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Проверка планов PostgreSQL.')
+class CompositeIndexTests(TestCase):
+    """Обратные выборки по рецепту и автору идут по составным индексам."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.author = (
+            User.objects.create_user(
+                username=username, email=f'{username}@example.com',
+                first_name='Имя', last_name='Фамилия', password='password'
+            )
+            for username in ('reader', 'author')
+        )
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='Рецепт', image='recipes/test.jpg',
+            text='Описание', cooking_time=10
+        )
+        AmountIngredient.objects.create(
+            recipe=cls.recipe,
+            ingredient=Ingredient.objects.create(
+                name='Ингредиент', measurement_unit='г'
+            ),
+            amount=100
+        )
+        FavoriteRecipe.objects.create(user=cls.user, recipe=cls.recipe)
+        ShoppingList.objects.create(user=cls.user, recipe=cls.recipe)
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    def setUp(self):
+        # На нескольких строках планировщик выбрал бы полный просмотр.
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def test_indexes_in_plans(self):
+        querysets = {
+            'recipe_author_pub_date_idx': Recipe.objects.filter(
+                author=self.author
+            ).order_by('-pub_date', '-id')[:3],
+            'amount_recipe_ingredient_idx': AmountIngredient.objects.filter(
+                recipe=self.recipe
+            ).values('ingredient', 'amount'),
+            'favorite_recipe_user_idx': FavoriteRecipe.objects.filter(
+                recipe=self.recipe
+            ),
+            'shopping_recipe_user_idx': ShoppingList.objects.filter(
+                recipe=self.recipe
+            ),
+            'follow_author_user_idx': Follow.objects.filter(
+                author=self.author
+            ),
+        }
+        for index, queryset in querysets.items():
+            with self.subTest(index=index):
+                self.assertIn(index, queryset.explain())
+
+
+class CounterTests(TestCase):
+    """Счётчики избранного, рецептов и подписчиков."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.author = (
+            User.objects.create_user(
+                username=username, email=f'{username}@example.com',
+                first_name='Имя', last_name='Фамилия', password='password'
+            )
+            for username in ('reader', 'author')
+        )
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='Рецепт', image='recipes/test.jpg',
+            text='Описание', cooking_time=10
+        )
+
+    def assert_counters(self, favorites, recipes, followers):
+        self.recipe.refresh_from_db()
+        self.author.refresh_from_db()
+        self.assertEqual(self.recipe.favorites_count, favorites)
+        self.assertEqual(self.author.recipes_count, recipes)
+        self.assertEqual(self.author.followers_count, followers)
+
+    def test_signals(self):
+        self.assert_counters(0, 1, 0)
+        favorite = FavoriteRecipe.objects.create(
+            user=self.user, recipe=self.recipe
+        )
+        follow = Follow.objects.create(user=self.user, author=self.author)
+        self.assert_counters(1, 1, 1)
+        favorite.delete()
+        follow.delete()
+        self.assert_counters(0, 1, 0)
+        Recipe.objects.get(pk=self.recipe.pk).delete()
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.recipes_count, 0)
+
+    def test_stale_save(self):
+        """Сохранение загруженной ранее записи не затирает счётчики."""
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        author = User.objects.get(pk=self.author.pk)
+        FavoriteRecipe.objects.create(user=self.user, recipe=self.recipe)
+        Follow.objects.create(user=self.user, author=self.author)
+        recipe.name = 'Новое название'
+        recipe.save()
+        author.first_name = 'Автор'
+        author.save()
+        self.assert_counters(1, 1, 1)
+        self.assertEqual(self.recipe.name, 'Новое название')
+        self.assertEqual(self.author.first_name, 'Автор')
+
+    def test_recount(self):
+        FavoriteRecipe.objects.create(user=self.user, recipe=self.recipe)
+        Recipe.objects.update(favorites_count=5)
+        User.objects.filter(pk=self.author.pk).update(
+            recipes_count=0, followers_count=2
+        )
+        self.assertEqual(recount(), {
+            'recipe.favorites_count': 1,
+            'customuser.recipes_count': 1,
+            'customuser.followers_count': 1,
+        })
+        self.assert_counters(1, 1, 0)
+        self.assertEqual(recount(), {
+            'recipe.favorites_count': 0,
+            'customuser.recipes_count': 0,
+            'customuser.followers_count': 0,
+        })
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Поиск только в PostgreSQL.')
+class SearchVectorTests(TestCase):
+    """Поисковый вектор пересчитывается один раз за транзакцию."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Имя', last_name='Фамилия', password='password'
+        )
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f'Flour {number}', measurement_unit='г'
+            )
+            for number in range(3)
+        ]
+
+    def search_vector_updates(self, action):
+        with CaptureQueriesContext(connection) as context:
+            with self.captureOnCommitCallbacks(execute=True):
+                with transaction.atomic():
+                    result = action()
+        return result, sum(
+            query['sql'].startswith('UPDATE')
+            and '"search_vector"' in query['sql']
+            for query in context.captured_queries
+        )
+
+    def create_recipe(self):
+        recipe = Recipe.objects.create(
+            author=self.author, name='Рецепт', image='recipes/test.jpg',
+            image_variants_source='recipes/test.jpg', text='Описание',
+            cooking_time=10
+        )
+        for ingredient in self.ingredients:
+            AmountIngredient.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=100
+            )
+        return recipe
+
+    def test_one_update_per_commit(self):
+        recipe, updates = self.search_vector_updates(self.create_recipe)
+        self.assertEqual(updates, 1)
+        self.assertTrue(Recipe.objects.filter(
+            pk=recipe.pk,
+            search_vector=SearchQuery('flour', config=SEARCH_CONFIG)
+        ).exists())
+
+    def test_deleted_recipe(self):
+        recipe, _ = self.search_vector_updates(self.create_recipe)
+        _, updates = self.search_vector_updates(recipe.delete)
+        self.assertEqual(updates, 0)
+
+
+@mock.patch('recipes.signals.schedule_variants')
+class ImageVariantsTests(TestCase):
+    """Задача на варианты изображения ставится только для нового."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Имя', last_name='Фамилия', password='password'
+        )
+
+    def save(self, recipe):
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.save()
+
+    def test_new_image(self, schedule_variants):
+        recipe = Recipe(
+            author=self.author, name='Рецепт', image='recipes/old.jpg',
+            text='Описание', cooking_time=10
+        )
+        self.save(recipe)
+        recipe.image = 'recipes/new.jpg'
+        self.save(recipe)
+        self.save(recipe)
+        self.assertEqual(schedule_variants.call_args_list, [
+            mock.call('recipes/old.jpg'), mock.call('recipes/new.jpg')
+        ])
+
+    def test_same_image(self, schedule_variants):
+        recipe = Recipe.objects.create(
+            author=self.author, name='Рецепт', image='recipes/test.jpg',
+            text='Описание', cooking_time=10
+        )
+        schedule_variants.reset_mock()
+        recipe = Recipe.objects.get(pk=recipe.pk)
+        recipe.name = 'Новое название'
+        self.save(recipe)
+        self.save(Recipe.objects.defer('image').get(pk=recipe.pk))
+        schedule_variants.assert_not_called()
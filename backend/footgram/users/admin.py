@@ -13,7 +13,9 @@ class CustomUserAdmin(UserAdmin):
         'username',
         'first_name',
         'last_name',
-        'email'
+        'email',
+        'recipes_count',
+        'followers_count'
     )
     list_filter = ('email', 'username')
     search_fields = ('username',)
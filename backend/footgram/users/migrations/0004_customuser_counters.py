@@ -0,0 +1,23 @@
+# Generated by Django 3.2.4 on 2026-10-18 19:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_follow_subscribe_to_yourself'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество подписчиков'),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='recipes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество рецептов'),
+        ),
+    ]
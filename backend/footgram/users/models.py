@@ -1,11 +1,34 @@
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import models, transaction
 
 USER_NAME_LENGTH = 150
 EMAIL_LENGTH = 254
 
 
-class CustomUser(AbstractUser):
+class CountersModel(models.Model):
+    """Модель со счётчиками, которые меняются только через F().
+
+    save() существующей записи не пишет COUNTER_FIELDS, чтобы не
+    затереть устаревшими значениями параллельные изменения счётчиков.
+    """
+    COUNTER_FIELDS = ()
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if (not self._state.adding and not args
+                and not kwargs.get('force_insert')
+                and kwargs.get('update_fields') is None):
+            excluded = {*self.COUNTER_FIELDS, *self.get_deferred_fields()}
+            kwargs['update_fields'] = [
+                field.attname for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in excluded
+            ]
+        super().save(*args, **kwargs)
+
+
+class CustomUser(CountersModel, AbstractUser):
     """Кастомная модель пользователя."""
     email = models.EmailField(
         max_length=EMAIL_LENGTH,
@@ -20,6 +43,17 @@ class CustomUser(AbstractUser):
         max_length=USER_NAME_LENGTH,
         verbose_name='Фамилия'
     )
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='Количество рецептов',
+        default=0,
+        editable=False
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name='Количество подписчиков',
+        default=0,
+        editable=False
+    )
+    COUNTER_FIELDS = ('recipes_count', 'followers_count')
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
 
@@ -43,7 +77,8 @@ class Follow(models.Model):
         CustomUser,
         on_delete=models.CASCADE,
         related_name='following',
-        verbose_name='Автор'
+        verbose_name='Автор',
+        db_index=False
     )
 
     class Meta:
@@ -60,6 +95,17 @@ class Follow(models.Model):
                 check=~models.Q(user=models.F("author"))
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['author', 'user'],
+                name='follow_author_user_idx'
+            )
+        ]
 
     def __str__(self):
         return f'Подписчик: {self.user}, автор: {self.author}'
+
+    def save(self, *args, **kwargs):
+        """Счётчики (recipes/signals.py) меняются в той же транзакции."""
+        with transaction.atomic():
+            super().save(*args, **kwargs)